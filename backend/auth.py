@@ -1,41 +1,64 @@
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from typing import NamedTuple, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
-from . import models, schemas
-from .database import get_db
+from . import models, schemas, hashing, config
+from .cache import TTLCache
+from .database import get_db, run_db
 
 # JWT Configuration
 SECRET_KEY = "YOUR_SECRET_KEY_HERE"  # Change this to a secure random key in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+class Principal(NamedTuple):
+    """Authenticated user as seen by the routes, detached from any session"""
+    id: int
+    username: str
+    role: str
+
+# Verified tokens -> Principal, so repeat requests skip the JWT decode and user query.
+# Entries never outlive the token's exp nor TOKEN_CACHE_TTL (bounds staleness across workers).
+token_cache = TTLCache(maxsize=config.TOKEN_CACHE_SIZE, ttl=config.TOKEN_CACHE_TTL)
+
+def invalidate_user(user_id: int):
+    """Forget cached tokens of a user whose role changed or who was deleted"""
+    return token_cache.discard_where(lambda principal: principal.id == user_id)
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing.context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hashing.context().hash(password)
 
 def get_user(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user(db, username)
+def _store_password_hash(db: Session, user: models.User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+
+async def authenticate_user(db, username: str, password: str):
+    user = await run_db(db, get_user, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # bcrypt is pure CPU, run it on the hashing pool
+    valid, new_hash = await hashing.verify_password(password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        # Stored hash predates the current cost factor; upgrade it while we have the password
+        await run_db(db, _store_password_hash, user, new_hash)
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    # python-jose (and the crypto backends it probes) is imported on first use, not at app import
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -45,12 +68,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -59,7 +88,9 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = get_user(db, username=token_data.username)
+    user = await run_db(db, get_user, username=token_data.username)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    principal = Principal(id=user.id, username=user.username, role=user.role)
+    token_cache.set(token, principal, expires_at=payload.get("exp"))
+    return principal
\ No newline at end of file
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire at an absolute time.
+
+    Lookups and inserts are O(1); hit/miss/eviction counters are kept for
+    monitoring.
+    """
+
+    def __init__(self, maxsize: int, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, expires_at: float = None):
+        if self.maxsize <= 0:
+            return
+        if self.ttl is not None:
+            cap = time.time() + self.ttl
+            expires_at = cap if expires_at is None else min(expires_at, cap)
+        if expires_at is None:
+            expires_at = float("inf")
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def discard_where(self, predicate):
+        """Drop every entry whose value matches `predicate`; returns how many were removed"""
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -1,11 +1,22 @@
+import heapq
+import importlib
+import json
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from itertools import islice
+from typing import List
+from sqlalchemy import and_, delete, func, insert, literal, literal_column, or_, select, update
 from sqlalchemy.orm import Session
-from . import models, schemas, auth
+from . import models, schemas, auth, events, search, sharding, utils
 
 # User operations
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = auth.get_password_hash(user.password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str = None):
+    if hashed_password is None:
+        hashed_password = auth.get_password_hash(user.password)
     db_user = models.User(username=user.username, hashed_password=hashed_password)
     db.add(db_user)
+    sharding.assign_new_user(db, db_user)
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -19,39 +30,575 @@ def get_user_by_username(db: Session, username: str):
 def get_users(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.User).offset(skip).limit(limit).all()
 
+def update_user_role(db: Session, user_id: int, role: str):
+    db_user = get_user(db, user_id)
+    if not db_user:
+        return None
+    db_user.role = role
+    db.commit()
+    db.refresh(db_user)
+    auth.invalidate_user(user_id)
+    return db_user
+
+def delete_user(db: Session, user_id: int):
+    db_user = get_user(db, user_id)
+    if db_user:
+        sharding.route_owner(db, user_id, for_write=True)
+        db.delete(db_user)
+        # Their tasks lose their owner, so they no longer count towards anyone's analytics
+        db.execute(delete(models.TaskStatusCount).where(models.TaskStatusCount.owner_id == user_id))
+        sharding.forget_user(db, user_id)
+        db.commit()
+        auth.invalidate_user(user_id)
+        return True
+    return False
+
+# Counter rows (task versions, analytics) are adjusted with upserts on the
+# dialects with INSERT ... ON CONFLICT; their modules are imported on first use
+# (the postgresql one takes longer to import than the rest of crud)
+_UPSERT_DIALECTS = ("sqlite", "postgresql")
+
+def _add_to_counters(db: Session, table, column: str, deltas):
+    """Add {primary key tuple: delta} to `column` of the counter rows, creating missing rows"""
+    keys = [key.name for key in table.primary_key]
+    rows = [dict(zip(keys, key), **{column: delta}) for key, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect not in _UPSERT_DIALECTS:
+        # Portable fallback: one UPDATE per counter, INSERT when it did not exist yet
+        for row in rows:
+            where = [table.c[key] == row[key] for key in keys]
+            if not db.execute(update(table).where(*where).values({column: table.c[column] + row[column]})).rowcount:
+                db.execute(insert(table).values(row))
+        return
+    upsert = importlib.import_module(f"sqlalchemy.dialects.{dialect}").insert
+    stmt = upsert(table).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c[key] for key in keys], set_={column: table.c[column] + stmt.excluded[column]}
+    ))
+
+# Task list versions: every task write bumps its owners' counters in the same
+# transaction, so a version always identifies one state of the owner's tasks
+def _bump_task_versions(db: Session, owner_ids):
+    owner_ids = {owner_id for owner_id in owner_ids if owner_id is not None}
+    _add_to_counters(db, models.TaskVersion.__table__, "version", {(owner_id,): 1 for owner_id in owner_ids})
+
+def get_task_version(db: Session, owner_id: int) -> int:
+    sharding.route_owner(db, owner_id)
+    return db.query(models.TaskVersion.version).filter(models.TaskVersion.owner_id == owner_id).scalar() or 0
+
+def get_global_task_version(db: Session) -> int:
+    """Version of the all-tasks view: the sum only grows, since every bump adds one"""
+    if sharding.fan_out(db):
+        return sum(sharding.each_shard(db, get_global_task_version))
+    return db.query(func.coalesce(func.sum(models.TaskVersion.version), 0)).scalar()
+
+# Analytics counters: task writes adjust task_status_counts (live tasks per
+# owner and status) and task_daily_counts (tasks created per day) in the same
+# transaction, so analytics never have to scan tasks
+def _count_statuses(db: Session, changes):
+    """Apply (owner_id, status, delta) triples to task_status_counts"""
+    deltas = Counter()
+    for owner_id, status, delta in changes:
+        if owner_id is not None:
+            deltas[owner_id, _plain(status)] += delta
+    _add_to_counters(db, models.TaskStatusCount.__table__, "count", deltas)
+
+def _count_created(db: Session, owner_id: int, created: int, now: datetime):
+    _add_to_counters(db, models.TaskDailyCount.__table__, "created", {(now.date(), owner_id): created})
+
+def _completion(counts):
+    total = sum(counts.values())
+    return dict(counts, total=total, completion_rate=round(counts.get("done", 0) / total, 4) if total else 0.0)
+
+def _counter_rows(db: Session, first_day):
+    """[(owner_id, username, status, count)] by owner and [(day, created)] since first_day"""
+    counts = models.TaskStatusCount
+    rows = db.execute(
+        select(counts.owner_id, models.User.username, counts.status, counts.count)
+        .outerjoin(models.User, models.User.id == counts.owner_id)
+        .where(counts.count != 0)
+        .order_by(counts.owner_id)
+    ).all()
+    daily = db.execute(
+        select(models.TaskDailyCount.day, func.sum(models.TaskDailyCount.created))
+        .where(models.TaskDailyCount.day >= first_day)
+        .group_by(models.TaskDailyCount.day)
+    ).all()
+    return rows, daily
+
+def get_task_analytics(db: Session, days: int = 30):
+    """Global and per-user status counts and completion rates, plus tasks created per day
+    over the last `days` UTC days; reads only the counter tables"""
+    first_day = datetime.utcnow().date() - timedelta(days=days - 1)
+    parts = sharding.each_shard(db, _counter_rows, first_day) if sharding.fan_out(db) else [_counter_rows(db, first_day)]
+    usernames = {}
+    if len(parts) > 1:
+        # Users live on the main database; the shards' own users tables are empty
+        usernames = dict(db.execute(select(models.User.id, models.User.username)).all())
+    users, totals, daily = {}, Counter(), Counter()
+    for rows, part_daily in parts:
+        for owner_id, username, status, count in rows:
+            user = users.setdefault(owner_id, {"owner_id": owner_id, "username": username, "counts": {}})
+            user["username"] = user["username"] or usernames.get(owner_id)
+            user["counts"][status] = count
+            totals[status] += count
+        daily.update(dict(part_daily))
+    return schemas.TaskAnalytics(
+        totals=_completion(totals),
+        users=[dict(_completion(users[owner_id].pop("counts")), **users[owner_id]) for owner_id in sorted(users)],
+        # Days without creates are included as zeros
+        created_per_day=[
+            {"day": day, "created": daily.get(day, 0)} for day in (first_day + timedelta(days=i) for i in range(days))
+        ],
+    )
+
+# Task revisions: every task write appends the fields it changed to
+# task_revisions in the same transaction, and soft-deleted tasks keep their row
+REVISION_FIELDS = ("title", "description", "status")
+
+def _plain(value):
+    return value.value if isinstance(value, Enum) else value
+
+def task_changes(values, old=None):
+    """The revision fields in `values` that differ from `old` (all of them when there is no `old`)"""
+    changes = {}
+    for field in REVISION_FIELDS:
+        if field in values and (old is None or _plain(values[field]) != _plain(old[field])):
+            changes[field] = _plain(values[field])
+    return changes
+
+def revision_row(task_id: int, op: str, changes, changed_at: datetime):
+    return {"task_id": task_id, "changed_at": changed_at, "op": op, "changes": utils.dumps_json(changes).decode()}
+
+def _record_revisions(db: Session, rows):
+    if rows:
+        db.execute(insert(models.TaskRevision), rows)
+
+def _live(query):
+    return query.filter(models.Task.deleted_at.is_(None))
+
 # Task operations
 def create_task(db: Session, task: schemas.TaskCreate, owner_id: int):
-    db_task = models.Task(**task.dict(), owner_id=owner_id)
-    db.add(db_task)
+    """Single INSERT ... RETURNING of the response columns"""
+    sharding.route_owner(db, owner_id, for_write=True)
+    values = dict(task.dict(), owner_id=owner_id)
+    ids = sharding.allocate_ids(db, 1)
+    if ids is not None:
+        values["id"] = ids[0]
+    row = db.execute(
+        insert(models.Task).values(**values)
+        .returning(*(getattr(models.Task, column) for column in TASK_LIST_COLUMNS))
+    ).first()
+    now = datetime.utcnow()
+    _bump_task_versions(db, [owner_id])
+    _count_statuses(db, [(owner_id, row.status, 1)])
+    _count_created(db, owner_id, 1, now)
+    _record_revisions(db, [revision_row(row.id, "created", task_changes(row._asdict()), now)])
     db.commit()
-    db.refresh(db_task)
-    return db_task
+    events.emit(db, [(owner_id, "task.created", row._asdict())])
+    return row
+
+def _filter_tasks(query, filters: schemas.TaskFilter = None):
+    if filters is None:
+        return query
+    if filters.status:
+        query = query.filter(models.Task.status.in_(filters.status))
+    if filters.q:
+        query = query.filter(models.Task.title.contains(filters.q, autoescape=True))
+    if filters.title_prefix:
+        query = query.filter(models.Task.title.startswith(filters.title_prefix, autoescape=True))
+    return query
 
-def get_tasks(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Task).offset(skip).limit(limit).all()
+def _paginate(query, skip: int, limit: int, after_id: int = None, filters: schemas.TaskFilter = None):
+    sort = filters.sort if filters is not None else schemas.TaskSort.id
+    descending = sort.value.startswith("-")
+    column = getattr(models.Task, sort.value.lstrip("-"))
+    # Ties on title/status are broken by id so pages are stable
+    order = [column.desc() if descending else column]
+    if column is not models.Task.id:
+        order.append(models.Task.id)
+    query = query.order_by(*order)
+
+    # Keyset mode seeks past the last seen id instead of scanning `skip` rows
+    if after_id is not None:
+        seek = models.Task.id < after_id if descending else models.Task.id > after_id
+        return query.filter(seek).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
+def _merged_page(db: Session, fn, skip: int, limit: int, after_id: int = None, sort=schemas.TaskSort.id, **kwargs):
+    """fn's page over every shard: each shard's first skip + limit rows, merged in page order"""
+    if after_id is not None:
+        skip = 0
+    pages = sharding.each_shard(db, fn, skip=0, limit=skip + limit, after_id=after_id, **kwargs)
+    return sharding.merge_sorted(pages, sort.value.lstrip("-"), sort.value.startswith("-"))[skip:skip + limit]
+
+def _sort(filters: schemas.TaskFilter = None):
+    return filters.sort if filters is not None else schemas.TaskSort.id
+
+def get_tasks(db: Session, skip: int = 0, limit: int = 100, after_id: int = None, filters: schemas.TaskFilter = None):
+    if sharding.fan_out(db):
+        return _merged_page(db, get_tasks, skip, limit, after_id, _sort(filters), filters=filters)
+    query = _filter_tasks(_live(db.query(models.Task)), filters)
+    return _paginate(query, skip, limit, after_id, filters)
+
+# Response fields of schemas.Task, in its output order, for the column-only listing
+TASK_LIST_COLUMNS = tuple(schemas.Task.__fields__)
+
+def get_task_rows(
+    db: Session, owner_id: int = None, skip: int = 0, limit: int = 100, after_id: int = None,
+    filters: schemas.TaskFilter = None
+):
+    """Same page as get_tasks/get_user_tasks, as plain dicts of TASK_LIST_COLUMNS"""
+    if owner_id is not None:
+        sharding.route_owner(db, owner_id)
+    elif sharding.fan_out(db):
+        return _merged_page(db, get_task_rows, skip, limit, after_id, _sort(filters), filters=filters)
+    query = _live(db.query(*(getattr(models.Task, column) for column in TASK_LIST_COLUMNS)))
+    if owner_id is not None:
+        query = query.filter(models.Task.owner_id == owner_id)
+    rows = _paginate(_filter_tasks(query, filters), skip, limit, after_id, filters)
+    return [row._asdict() for row in rows]
 
 def get_task(db: Session, task_id: int):
-    return db.query(models.Task).filter(models.Task.id == task_id).first()
+    if sharding.route_task(db, task_id) is None:
+        return None
+    return _live(db.query(models.Task)).filter(models.Task.id == task_id).first()
+
+def get_user_tasks(
+    db: Session, owner_id: int, skip: int = 0, limit: int = 100, after_id: int = None, filters: schemas.TaskFilter = None
+):
+    sharding.route_owner(db, owner_id)
+    query = _filter_tasks(_live(db.query(models.Task)).filter(models.Task.owner_id == owner_id), filters)
+    return _paginate(query, skip, limit, after_id, filters)
 
-def get_user_tasks(db: Session, owner_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.Task).filter(models.Task.owner_id == owner_id).offset(skip).limit(limit).all()
+def _ranked_search(db: Session, q: str, owner_id: int = None, skip: int = 0, limit: int = 50):
+    """[(task, rank)] matching q, best (lowest rank) first"""
+    terms = search.query_terms(q)
+    # Soft-deleted tasks stay in tasks_fts and are filtered out here
+    query = _live(db.query(models.Task))
+    if owner_id is not None:
+        query = query.filter(models.Task.owner_id == owner_id)
 
-def update_task(db: Session, task_id: int, task_data: schemas.TaskUpdate):
-    db_task = get_task(db, task_id)
-    if not db_task:
+    if search.has_index(db.connection()):
+        rank = func.bm25(literal_column("tasks_fts"), search.TITLE_WEIGHT, search.DESCRIPTION_WEIGHT, 0.0)
+        query = (
+            query.add_columns(rank)
+            .join(search.tasks_fts, search.tasks_fts.c.rowid == models.Task.id)
+            .filter(literal_column("tasks_fts").op("MATCH")(search.match_expression(q, owner_id)))
+            .order_by(rank, models.Task.id)
+        )
+    else:
+        # No FTS index (non-SQLite database): unranked substring match on either column
+        for term in terms:
+            query = query.filter(or_(
+                models.Task.title.contains(term, autoescape=True),
+                models.Task.description.contains(term, autoescape=True),
+            ))
+        query = query.add_columns(literal(0.0)).order_by(models.Task.id)
+    return query.offset(skip).limit(limit).all()
+
+def search_tasks(db: Session, q: str, owner_id: int = None, skip: int = 0, limit: int = 50):
+    """Tasks whose title/description contain every word of q, best matches first"""
+    if not search.query_terms(q):
+        return []
+    if owner_id is not None:
+        sharding.route_owner(db, owner_id)
+    elif sharding.fan_out(db):
+        # Each shard ranks against its own statistics, so bm25 scores only roughly compare across shards
+        hits = [hit for page in sharding.each_shard(db, _ranked_search, q, skip=0, limit=skip + limit) for hit in page]
+        hits.sort(key=lambda hit: (hit[1], hit[0].id))
+        return [task for task, _ in hits[skip:skip + limit]]
+    return [task for task, _ in _ranked_search(db, q, owner_id, skip, limit)]
+
+def get_task_stats(db: Session, owner_id: int = None):
+    """Per-status task counts in a single GROUP BY; all tasks when owner_id is None"""
+    if owner_id is not None:
+        sharding.route_owner(db, owner_id)
+    elif sharding.fan_out(db):
+        shards = sharding.each_shard(db, get_task_stats)
+        return schemas.TaskStats(**{field: sum(getattr(stats, field) for stats in shards) for field in schemas.TaskStats.__fields__})
+    query = _live(db.query(models.Task.status, func.count(models.Task.id)))
+    if owner_id is not None:
+        query = query.filter(models.Task.owner_id == owner_id)
+    counts = {status.value: count for status, count in query.group_by(models.Task.status).all()}
+    return schemas.TaskStats(**counts, total=sum(counts.values()))
+
+EXPORT_COLUMNS = ("id", "title", "description", "status", "owner_id")
+
+def task_export_statement(owner_id: int = None, batch_size: int = 1000):
+    """Column-only SELECT for exports, fetched `batch_size` rows at a time instead of all at once"""
+    stmt = _live(select(*(getattr(models.Task, column) for column in EXPORT_COLUMNS))).order_by(models.Task.id)
+    if owner_id is not None:
+        stmt = stmt.where(models.Task.owner_id == owner_id)
+    return stmt.execution_options(yield_per=batch_size)
+
+def iter_task_rows(db: Session, owner_id: int = None, batch_size: int = 1000):
+    """Yield lists of plain row tuples, one list per fetched batch"""
+    if owner_id is not None:
+        sharding.route_owner(db, owner_id)
+    elif sharding.fan_out(db):
+        # One stream per shard, merged back into id order
+        streams = sharding.each_shard(db, lambda shard_db: shard_db.execute(task_export_statement(None, batch_size)))
+        rows = heapq.merge(*streams, key=lambda row: row[0])
+        while batch := list(islice(rows, batch_size)):
+            yield batch
+        return
+    result = db.execute(task_export_statement(owner_id, batch_size))
+    for partition in result.partitions():
+        yield partition
+
+def _owned_task(stmt, task_id: int, owner_id: int = None):
+    # owner_id None is the admin bypass; otherwise ownership is part of the WHERE clause
+    stmt = stmt.where(models.Task.id == task_id, models.Task.deleted_at.is_(None))
+    if owner_id is not None:
+        stmt = stmt.where(models.Task.owner_id == owner_id)
+    return stmt.execution_options(synchronize_session=False)
+
+def _read_for_update(stmt):
+    """Turn an UPDATE of live tasks into a locking read of their current values.
+
+    A no-op UPDATE ... RETURNING instead of a SELECT: SQLite ignores FOR UPDATE,
+    but an UPDATE takes the write lock (row locks elsewhere) before it reads, so
+    no concurrent update or delete can land between this read and the writes
+    based on it. Setting deleted_at to NULL again fires no triggers.
+    """
+    return stmt.values(deleted_at=None).returning(*(getattr(models.Task, column) for column in EXPORT_COLUMNS))
+
+def update_task(db: Session, task_id: int, task_data: schemas.TaskUpdate, owner_id: int = None):
+    """Write and log only the fields that changed; None when the task is missing or not owned by owner_id"""
+    if owner_id is not None:
+        sharding.route_owner(db, owner_id, for_write=True)
+    elif sharding.route_task(db, task_id, for_write=True) is None:
         return None
-    
-    for key, value in task_data.dict().items():
-        setattr(db_task, key, value)
-    
-    db.commit()
-    db.refresh(db_task)
-    return db_task
-
-def delete_task(db: Session, task_id: int):
-    db_task = get_task(db, task_id)
-    if db_task:
-        db.delete(db_task)
+    old = db.execute(_read_for_update(_owned_task(update(models.Task), task_id, owner_id))).first()
+    if old is None:
         db.commit()
-        return True
-    return False
\ No newline at end of file
+        return None
+    changes = task_changes(task_data.dict(), old._asdict())
+    if changes and not db.execute(_owned_task(update(models.Task), task_id).values(**changes)).rowcount:
+        # Only possible if the row lock did not hold; write nothing rather than log a phantom update
+        db.rollback()
+        return None
+    if changes:
+        _bump_task_versions(db, [old.owner_id])
+        if "status" in changes:
+            _count_statuses(db, [(old.owner_id, old.status, -1), (old.owner_id, changes["status"], 1)])
+        _record_revisions(db, [revision_row(task_id, "updated", changes, datetime.utcnow())])
+    db.commit()
+    task = dict(old._asdict(), **changes)
+    if changes:
+        events.emit(db, [(old.owner_id, "task.updated", task)])
+    return task
+
+def delete_task(db: Session, task_id: int, owner_id: int = None):
+    """Soft delete in a single UPDATE ... RETURNING; False when the task is missing or not owned by owner_id"""
+    if owner_id is not None:
+        sharding.route_owner(db, owner_id, for_write=True)
+    elif sharding.route_task(db, task_id, for_write=True) is None:
+        return False
+    now = datetime.utcnow()
+    stmt = _owned_task(update(models.Task), task_id, owner_id).values(deleted_at=now)
+    deleted = db.execute(stmt.returning(models.Task.owner_id, models.Task.status)).first()
+    if deleted is not None:
+        _bump_task_versions(db, [deleted.owner_id])
+        _count_statuses(db, [(deleted.owner_id, deleted.status, -1)])
+        _record_revisions(db, [revision_row(task_id, "deleted", {}, now)])
+    db.commit()
+    if deleted is not None:
+        events.emit(db, [(deleted.owner_id, "task.deleted", {"id": task_id, "owner_id": deleted.owner_id})])
+    return deleted is not None
+
+def task_exists(db: Session, task_id: int):
+    if sharding.route_task(db, task_id) is None:
+        return False
+    return _live(db.query(models.Task.id)).filter(models.Task.id == task_id).first() is not None
+
+# Task history
+def get_task_owner(db: Session, task_id: int):
+    """Owner of a task, soft-deleted or not; None when it never existed"""
+    if sharding.route_task(db, task_id) is None:
+        return None
+    return db.query(models.Task.owner_id).filter(models.Task.id == task_id).scalar()
+
+def get_task_history(db: Session, task_id: int, skip: int = 0, limit: int = 100):
+    """Revisions of a task, oldest first"""
+    sharding.route_task(db, task_id)
+    query = db.query(models.TaskRevision).filter(models.TaskRevision.task_id == task_id)
+    return query.order_by(models.TaskRevision.id).offset(skip).limit(limit).all()
+
+def _utc(as_of: datetime):
+    # Revision times are stored as naive UTC
+    return as_of.astimezone(timezone.utc).replace(tzinfo=None) if as_of.tzinfo else as_of
+
+def _replay(db: Session, task_ids, as_of: datetime):
+    """{task_id: revision fields} as of `as_of`, folded from the revision log; deleted tasks drop out"""
+    stmt = (
+        select(models.TaskRevision.task_id, models.TaskRevision.op, models.TaskRevision.changes)
+        .where(models.TaskRevision.task_id.in_(task_ids), models.TaskRevision.changed_at <= as_of)
+        .order_by(models.TaskRevision.task_id, models.TaskRevision.id)
+    )
+    state = {}
+    for task_id, op, changes in db.execute(stmt):
+        if op == "deleted":
+            state.pop(task_id, None)
+        else:
+            state.setdefault(task_id, {}).update(json.loads(changes))
+    return state
+
+def get_task_as_of(db: Session, task_id: int, owner_id: int, as_of: datetime):
+    """The task as it was at `as_of`; None when it did not exist then"""
+    sharding.route_owner(db, owner_id)
+    values = _replay(db, [task_id], _utc(as_of)).get(task_id)
+    return None if values is None else dict(values, id=task_id, owner_id=owner_id)
+
+def get_tasks_as_of(
+    db: Session, as_of: datetime, owner_id: int = None, skip: int = 0, limit: int = 100, after_id: int = None
+):
+    """The page of tasks, in id order, that existed at `as_of`, as they were then"""
+    if owner_id is not None:
+        sharding.route_owner(db, owner_id)
+    elif sharding.fan_out(db):
+        return _merged_page(db, get_tasks_as_of, skip, limit, after_id, as_of=as_of)
+    as_of = _utc(as_of)
+    created = and_(models.TaskRevision.task_id == models.Task.id, models.TaskRevision.op == "created")
+    stmt = (
+        select(models.Task.id, models.Task.owner_id)
+        .join(models.TaskRevision, created)
+        .where(
+            models.TaskRevision.changed_at <= as_of,
+            or_(models.Task.deleted_at.is_(None), models.Task.deleted_at > as_of),
+        )
+        .order_by(models.Task.id)
+    )
+    if owner_id is not None:
+        stmt = stmt.where(models.Task.owner_id == owner_id)
+    tasks = []
+    # Replay can drop candidates, so keep scanning past the last one until the page is full
+    while len(tasks) < limit:
+        page = stmt if after_id is None else stmt.where(models.Task.id > after_id)
+        owners = dict(db.execute(page.offset(skip).limit(limit - len(tasks))).all())
+        if not owners:
+            break
+        state = _replay(db, list(owners), as_of)
+        tasks += [dict(state[task_id], id=task_id, owner_id=owners[task_id]) for task_id in owners if task_id in state]
+        after_id, skip = max(owners), 0
+    return tasks
+
+# Bulk task operations: each batch is one transaction with a single ownership query,
+# which also locks the rows it found
+def _live_tasks(db: Session, task_ids):
+    """{id: current values} of the live tasks among task_ids, locked until commit (see _read_for_update)"""
+    stmt = update(models.Task).where(models.Task.id.in_(set(task_ids)), models.Task.deleted_at.is_(None))
+    stmt = _read_for_update(stmt.execution_options(synchronize_session=False))
+    return {row.id: row._asdict() for row in db.execute(stmt)}
+
+def _check_ownership(tasks, task_id: int, owner_id: int = None):
+    """Return an error BulkItemResult, or None when the item may be written (owner_id None = admin)"""
+    if task_id not in tasks:
+        return schemas.BulkItemResult(id=task_id, status_code=404, detail="Task not found")
+    if owner_id is not None and tasks[task_id]["owner_id"] != owner_id:
+        return schemas.BulkItemResult(id=task_id, status_code=403, detail="Not authorized to access this task")
+    return None
+
+def _by_shard(db: Session, fn, items, task_ids, **kwargs):
+    """Run the bulk fn on each shard's share of items (ids found nowhere go to shard 0); results in item order"""
+    locations = sharding.locate(db, task_ids)
+    sharding.check_writable(db, {owner_id for _, owner_id in locations.values()})
+    groups = {}
+    for index, task_id in enumerate(task_ids):
+        groups.setdefault(locations.get(task_id, (0, None))[0], []).append(index)
+    results = [None] * len(items)
+    for shard, indexes in sorted(groups.items()):
+        with sharding.on_shard(db, shard):
+            for index, result in zip(indexes, fn(db, [items[index] for index in indexes], **kwargs)):
+                results[index] = result
+    return results
+
+def create_tasks(db: Session, tasks: List[schemas.TaskCreate], owner_id: int):
+    if not tasks:
+        return []
+    sharding.route_owner(db, owner_id, for_write=True)
+    rows = [dict(task.dict(), owner_id=owner_id) for task in tasks]
+    ids = sharding.allocate_ids(db, len(rows))
+    if ids is not None:
+        for row, task_id in zip(rows, ids):
+            row["id"] = task_id
+    # executemany-style multi-row INSERT ... RETURNING the new rows. RETURNING order is
+    # not guaranteed, but ids are assigned in VALUES order, so sorting restores item order
+    created = sorted(db.execute(
+        insert(models.Task).returning(*(getattr(models.Task, column) for column in TASK_LIST_COLUMNS)), rows
+    ).all(), key=lambda row: row.id)
+    now = datetime.utcnow()
+    _bump_task_versions(db, [owner_id])
+    _count_statuses(db, [(owner_id, row.status, 1) for row in created])
+    _count_created(db, owner_id, len(created), now)
+    _record_revisions(db, [revision_row(row.id, "created", task_changes(row._asdict()), now) for row in created])
+    db.commit()
+    events.emit(db, [(owner_id, "task.created", row._asdict()) for row in created])
+    return [schemas.BulkItemResult(id=row.id, status_code=201) for row in created]
+
+def update_tasks(db: Session, patches: List[schemas.TaskPatch], owner_id: int = None):
+    if sharding.fan_out(db):
+        return _by_shard(db, update_tasks, patches, [patch.id for patch in patches], owner_id=owner_id)
+    tasks = _live_tasks(db, [patch.id for patch in patches])
+    results, rows, revisions, statuses = [], [], [], []
+    for patch in patches:
+        error = _check_ownership(tasks, patch.id, owner_id)
+        if error:
+            results.append(error)
+            continue
+        # Only fields that actually change are written and logged
+        changes = task_changes(patch.dict(exclude_unset=True), tasks[patch.id])
+        if changes:
+            task = tasks[patch.id]
+            if "status" in changes:
+                statuses += [(task["owner_id"], task["status"], -1), (task["owner_id"], changes["status"], 1)]
+            task.update(changes)
+            rows.append(dict(changes, id=patch.id))
+            revisions.append((patch.id, changes))
+        results.append(schemas.BulkItemResult(id=patch.id, status_code=200))
+    if rows:
+        # ORM bulk UPDATE by primary key, batched per distinct column set
+        db.execute(update(models.Task), rows)
+        _bump_task_versions(db, (tasks[row["id"]]["owner_id"] for row in rows))
+        _count_statuses(db, statuses)
+        now = datetime.utcnow()
+        _record_revisions(db, [revision_row(task_id, "updated", changes, now) for task_id, changes in revisions])
+    db.commit()
+    # Bulk update events carry only the changed fields
+    events.emit(db, [
+        (tasks[row["id"]]["owner_id"], "task.updated", dict(row, owner_id=tasks[row["id"]]["owner_id"])) for row in rows
+    ])
+    return results
+
+def delete_tasks(db: Session, task_ids: List[int], owner_id: int = None):
+    if sharding.fan_out(db):
+        return _by_shard(db, delete_tasks, task_ids, task_ids, owner_id=owner_id)
+    tasks = _live_tasks(db, task_ids)
+    owners = {task_id: task["owner_id"] for task_id, task in tasks.items()}
+    results, allowed = [], set()
+    for task_id in task_ids:
+        error = _check_ownership(tasks, task_id, owner_id)
+        if error is None and task_id in allowed:
+            error = schemas.BulkItemResult(id=task_id, status_code=404, detail="Task not found")
+        if error:
+            results.append(error)
+            continue
+        allowed.add(task_id)
+        results.append(schemas.BulkItemResult(id=task_id, status_code=204))
+    if allowed:
+        now = datetime.utcnow()
+        db.execute(
+            update(models.Task).where(models.Task.id.in_(allowed), models.Task.deleted_at.is_(None)).values(deleted_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        _bump_task_versions(db, (owners[task_id] for task_id in allowed))
+        _count_statuses(db, [(owners[task_id], tasks[task_id]["status"], -1) for task_id in allowed])
+        _record_revisions(db, [revision_row(task_id, "deleted", {}, now) for task_id in sorted(allowed)])
+    db.commit()
+    events.emit(db, [
+        (owners[task_id], "task.deleted", {"id": task_id, "owner_id": owners[task_id]}) for task_id in allowed
+    ])
+    return results
@@ -1,17 +1,182 @@
-from sqlalchemy import create_engine
+import contextvars
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from . import config, metrics
+
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+SQLITE_PROFILES = {
+    "default": {},
+    "production": {
+        # Readers no longer block behind writers; fsync only at checkpoints
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "temp_store": "MEMORY",
+    },
+}
+
+def _is_sqlite(url) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def _is_memory_sqlite(url) -> bool:
+    return make_url(url).database in (None, "", ":memory:")
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    pragmas = dict(SQLITE_PROFILES[config.SQLITE_PROFILE], busy_timeout=config.SQLITE_BUSY_TIMEOUT_MS)
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def engine_options(url: str) -> dict:
+    """create_engine/create_async_engine keyword arguments for `url` from the config"""
+    options = {}
+    if _is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+        if _is_memory_sqlite(url):
+            return options
+    if _is_sqlite(url) and make_url(url).get_dialect().is_async:
+        # aiosqlite defaults to NullPool; keep connections (and their pragmas) pooled
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+        options["poolclass"] = AsyncAdaptedQueuePool
+    options.update(
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+    )
+    return options
+
+def configure_engine(sync_engine):
+    """Install connection pragmas and instrumentation on a (sync) Engine"""
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    metrics.instrument_engine(sync_engine)
+    return sync_engine
+
+def pool_status(db_engine) -> dict:
+    """Connection counts of a QueuePool; other pool classes only report their name"""
+    pool = db_engine.pool
+    status = {"class": type(pool).__name__}
+    if hasattr(pool, "checkedout"):
+        status.update(size=pool.size(), checked_out=pool.checkedout(), idle=pool.checkedin(), overflow=max(0, pool.overflow()))
+    return status
+
+def create_db_engine(url: str):
+    return configure_engine(create_engine(url, **engine_options(url)))
+
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+
+# Task shards: engine n holds the tasks of the owners mapped to shard n
+shard_engines = [engine] + [
+    create_db_engine(config.SHARD_URL_TEMPLATE.format(shard=shard)) for shard in range(1, config.SHARDS)
+]
+if config.SHARDS > 1 and (config.READ_REPLICA_URL or config.ASYNC_DB or config.WRITE_QUEUE):
+    raise RuntimeError("TASKS_SHARDS > 1 does not support a read replica, TASKS_ASYNC_DB or TASKS_WRITE_QUEUE")
+
+# Tables that stay on the main database whichever shard a session is routed to
+MAIN_TABLES = {"users", "task_shards"}
+
+class ShardedSession(Session):
+    """Sends statements to the shard in ``info["shard"]`` (set by sharding.route_owner/route_task)
+
+    Statements on users and the shard map always go to the main database. A
+    session routed to several shards over its life holds one connection per
+    shard and commits them one after the other.
+    """
+
+    def get_bind(self, mapper=None, **kw):
+        shard = self.info.get("shard")
+        if not shard or (mapper is not None and mapper.local_table.name in MAIN_TABLES):
+            return super().get_bind(mapper, **kw)
+        return shard_engines[shard]
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./tasks.db"
+session_class = ShardedSession if config.SHARDS > 1 else Session
+SessionLocal = sessionmaker(bind=engine, class_=session_class, autoflush=False, autocommit=False)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+# Read replica: read-only routes get sessions from here (the primary when unset)
+replica_engine = create_db_engine(config.READ_REPLICA_URL) if config.READ_REPLICA_URL else engine
+ReplicaSessionLocal = sessionmaker(bind=replica_engine, class_=session_class, autoflush=False, autocommit=False)
 Base = declarative_base()
 
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def get_async_database_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver"""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver and not url.get_dialect().is_async:
+        url = url.set(drivername=driver)
+    return url.render_as_string(hide_password=False)
+
+# Async engine/session, only built when the async mode is selected so that
+# aiosqlite stays an optional dependency
+async_engine = None
+AsyncSessionLocal = None
+AsyncReplicaSessionLocal = None
+if config.ASYNC_DB:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    async_url = get_async_database_url(SQLALCHEMY_DATABASE_URL)
+    async_engine = create_async_engine(async_url, **engine_options(async_url))
+    configure_engine(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+    async_replica_engine = async_engine
+    if config.READ_REPLICA_URL:
+        replica_async_url = get_async_database_url(config.READ_REPLICA_URL)
+        async_replica_engine = create_async_engine(replica_async_url, **engine_options(replica_async_url))
+        configure_engine(async_replica_engine.sync_engine)
+    AsyncReplicaSessionLocal = async_sessionmaker(
+        bind=async_replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
 # Dependency
-def get_db():
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+get_db = get_async_db if config.ASYNC_DB else get_sync_db
+
+# Read-only dependency; may lag behind writes made through get_db
+def get_sync_read_db():
+    db = ReplicaSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    async with AsyncReplicaSessionLocal() as db:
+        yield db
+
+get_read_db = get_async_read_db if config.ASYNC_DB else get_sync_read_db
+
+def is_async_session(db) -> bool:
+    return AsyncSessionLocal is not None and isinstance(db, AsyncSession)
+
+async def run_db(db, fn, *args, **kwargs):
+    """Run a sync crud function against either session type without blocking the event loop.
+
+    With an AsyncSession the function runs through ``run_sync`` so its I/O is
+    awaited on aiosqlite; with a plain Session it is pushed to the threadpool.
+    """
+    if is_async_session(db):
+        return await db.run_sync(lambda session: fn(session, *args, **kwargs))
+    # Carry the request context (per-request metrics) into the worker thread
+    context = contextvars.copy_context()
+    return await run_in_threadpool(context.run, fn, db, *args, **kwargs)
@@ -0,0 +1,187 @@
+"""In-process task change feed behind ``GET /tasks/events``.
+
+crud functions ``emit`` task events after their commit, from whatever thread
+they run on (threadpool, writer thread or the event loop itself). The broker
+hops onto the event loop with ``call_soon_threadsafe``; there each event gets
+a sequence number, is encoded once as a Server-Sent Events frame, kept in a
+bounded ring buffer for resumption and fanned out to the subscribers of its
+owner plus the admin (all tasks) subscribers.
+
+Each subscriber has a bounded queue. A consumer too slow to keep up is never
+allowed to block writers: its queue is dropped and it is sent a ``reset``
+event, telling the client to refetch the list. The same happens when a
+client resumes (``Last-Event-ID``) from an id that is no longer buffered or
+was issued by another process: every broker, including the copy a forked
+worker inherits from a preloading master, numbers its events under an epoch
+of its own.
+"""
+import asyncio
+import os
+import secrets
+from collections import deque
+
+from . import config, utils
+
+class Event:
+    __slots__ = ("seq", "owner_id", "frame")
+
+    def __init__(self, epoch, seq, owner_id, type, data):
+        self.seq = seq
+        self.owner_id = owner_id
+        self.frame = b"id: %s-%d\nevent: %s\ndata: %s\n\n" % (
+            epoch.encode(), seq, type.encode(), utils.dumps_json(data)
+        )
+
+def _reset_frame(epoch, seq):
+    return b"id: %s-%d\nevent: reset\ndata: {}\n\n" % (epoch.encode(), seq)
+
+KEEPALIVE = b": keepalive\n\n"
+
+class Subscription:
+    def __init__(self, broker, owner_id, maxsize):
+        self.broker = broker
+        self.owner_id = owner_id
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+        self.closed = False
+
+    def offer(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.broker.overflows += 1
+
+    async def frames(self, heartbeat: float):
+        """Yield SSE frames until the subscription is closed"""
+        while not self.closed:
+            if self.overflowed:
+                # Everything queued so far is covered by the reset
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.overflowed = False
+                yield _reset_frame(self.broker.epoch, self.broker.last_seq)
+                continue
+            try:
+                event = await asyncio.wait_for(self.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE
+                continue
+            if event is not None:
+                yield event.frame
+
+    def close(self):
+        self.closed = True
+        self.broker._unsubscribe(self)
+        try:
+            self.queue.put_nowait(None)  # wake a waiting consumer
+        except asyncio.QueueFull:
+            pass
+
+class EventBroker:
+    def __init__(self, buffer_size: int = 1024, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._buffer = deque(maxlen=buffer_size)
+        # owner id -> subscriptions; None holds the admin (all tasks) subscriptions
+        self._subscribers = {}
+        self._loop = None
+        # Distinguishes this broker's event ids from those of a restarted or sibling worker
+        self.epoch = secrets.token_hex(4)
+        self.last_seq = 0
+        self.overflows = 0
+
+    def attach(self, loop):
+        self._loop = loop
+
+    def _after_fork(self):
+        """A forked worker starts a feed of its own instead of continuing its parent's"""
+        self._buffer.clear()
+        self._subscribers = {}
+        self._loop = None
+        self.epoch = secrets.token_hex(4)
+        self.last_seq = 0
+
+    def publish(self, events):
+        """Thread-safe: queue [(owner_id, type, data), ...] for dispatch on the event loop"""
+        loop = self._loop
+        if not events or loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._dispatch, events)
+
+    def _dispatch(self, events):
+        everyone = self._subscribers.get(None, ())
+        for owner_id, type, data in events:
+            self.last_seq += 1
+            event = Event(self.epoch, self.last_seq, owner_id, type, data)
+            self._buffer.append(event)
+            for subscription in (*self._subscribers.get(owner_id, ()), *everyone):
+                subscription.offer(event)
+
+    def _replay(self, owner_id, last_event_id):
+        """Buffered events after `last_event_id` visible to owner_id, or None when a reset is needed"""
+        if not last_event_id:
+            return []
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.last_seq:
+            return None
+        seq = int(seq)
+        oldest = self._buffer[0].seq if self._buffer else self.last_seq + 1
+        if seq < oldest - 1:
+            return None
+        return [
+            event for event in self._buffer
+            if event.seq > seq and (owner_id is None or event.owner_id == owner_id)
+        ]
+
+    def subscribe(self, owner_id, last_event_id: str = None):
+        """Must be called on the event loop; owner_id None subscribes to every task"""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self, owner_id, self.queue_size)
+        replay = self._replay(owner_id, last_event_id)
+        if replay is None:
+            subscription.overflowed = True
+        else:
+            for event in replay:
+                subscription.offer(event)
+        self._subscribers.setdefault(owner_id, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        subscriptions = self._subscribers.get(subscription.owner_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.owner_id]
+
+    def close(self):
+        for subscriptions in list(self._subscribers.values()):
+            for subscription in list(subscriptions):
+                subscription.close()
+
+    def stats(self):
+        return {
+            "subscribers": sum(len(subscriptions) for subscriptions in self._subscribers.values()),
+            "last_seq": self.last_seq,
+            "buffered": len(self._buffer),
+            "overflows": self.overflows,
+        }
+
+broker = EventBroker(buffer_size=config.EVENTS_BUFFER_SIZE, queue_size=config.EVENTS_QUEUE_SIZE)
+if hasattr(os, "register_at_fork"):
+    # gunicorn imports the app in the master and forks the workers from it
+    os.register_at_fork(after_in_child=broker._after_fork)
+
+def emit(db, events):
+    """Publish [(owner_id, type, data), ...] once `db`'s work is committed.
+
+    Sessions whose commit is not final (the group-commit writer's savepoint
+    sessions) collect them in ``db.info["pending_events"]`` instead; the
+    writer publishes them after the batch commit.
+    """
+    pending = db.info.get("pending_events")
+    if pending is not None:
+        pending.extend(events)
+    else:
+        broker.publish(events)
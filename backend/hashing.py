@@ -0,0 +1,106 @@
+"""Password hashing on a bounded worker pool.
+
+bcrypt costs hundreds of milliseconds of CPU per call, so verification and
+hashing run in a dedicated process pool instead of the request threadpool.
+At most ``PASSWORD_HASH_MAX_PENDING`` operations may be queued or running; beyond
+that callers get a 429 so a login storm cannot starve task requests. A pool
+whose worker died is replaced and the call retried once; if that fails too
+callers get a 503.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from . import config
+
+@functools.lru_cache(maxsize=None)
+def context():
+    """The passlib CryptContext, built on first use (in this process or a pool worker)"""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS)
+
+_workers = config.PASSWORD_HASH_WORKERS
+_max_pending = config.PASSWORD_HASH_MAX_PENDING
+_pool = None
+_pending = 0
+_lock = threading.Lock()
+
+# Executed inside the worker processes, so they must stay module-level
+def _hash(password):
+    return context().hash(password)
+
+def _verify_and_update(password, hashed_password):
+    return context().verify_and_update(password, hashed_password)
+
+def configure(workers: int = None, max_pending: int = None):
+    """Resize the pool; workers=0 falls back to the threadpool (no extra processes)"""
+    global _workers, _max_pending
+    shutdown()
+    if workers is not None:
+        _workers = workers
+    if max_pending is not None:
+        _max_pending = max_pending
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def stats():
+    return {"workers": _workers, "max_pending": _max_pending, "pending": _pending}
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=_workers)
+    return _pool
+
+def _discard_pool(pool):
+    """Drop a broken pool (a worker was killed or crashed) so the next call starts a fresh one"""
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+async def _submit(fn, *args):
+    global _pending
+    with _lock:
+        if _pending >= _max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many concurrent password operations, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+    try:
+        if _workers <= 0:
+            return await run_in_threadpool(fn, *args)
+        for _ in range(2):
+            pool = _get_pool()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                _discard_pool(pool)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Password hashing is unavailable, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    finally:
+        with _lock:
+            _pending -= 1
+
+async def hash_password(password: str) -> str:
+    return await _submit(_hash, password)
+
+async def verify_password(password: str, hashed_password: str):
+    """Return (valid, new_hash); new_hash is set when the stored hash uses outdated parameters"""
+    return await _submit(_verify_and_update, password, hashed_password)
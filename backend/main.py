@@ -1,31 +1,97 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import APIRouter, FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import timedelta
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from pydantic import parse_obj_as
+from datetime import datetime, timedelta
+import asyncio
+import contextlib
+import time
 
-from . import models, schemas, crud, auth, utils
-from .database import engine, get_db
+from . import schemas, crud, auth, utils, config, database, migrations, hashing, metrics, writer, events, ratelimit, sharding
+from .cache import TTLCache
+from .database import engine, get_db, get_read_db, run_db, is_async_session
+from .writer import run_write
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+router = APIRouter(default_response_class=metrics.TimedJSONResponse, route_class=metrics.TimedRoute)
 
-app = FastAPI(title="Task Manager API")
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup and shutdown; importing this module touches neither the database nor any pool"""
+    # Bring the schema up to date (disable with TASKS_AUTO_MIGRATE=0 and run
+    # `python -m backend.migrations upgrade` as a deploy step instead)
+    if config.AUTO_MIGRATE:
+        await run_in_threadpool(migrations.upgrade_all)
+    events.broker.attach(asyncio.get_running_loop())
+    try:
+        yield
+    finally:
+        events.broker.close()
+        writer.shutdown()
+        hashing.shutdown()
 
-# Configure CORS for frontend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Update this with your frontend URL in production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def _database_health(db_engine):
+    start = time.perf_counter()
+    try:
+        with db_engine.connect() as conn:
+            version = migrations.applied_version(conn)
+    except Exception as exc:
+        return {"ok": False, "error": type(exc).__name__, "pool": database.pool_status(db_engine)}
+    return {
+        "ok": version == migrations.LATEST_VERSION,
+        "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+        "schema_version": version,
+        "pool": database.pool_status(db_engine),
+    }
+
+@router.get("/health", include_in_schema=False)
+async def health():
+    """Readiness: 200 once the database answers with an up-to-date schema, 503 otherwise"""
+    report = {"database": await run_in_threadpool(_database_health, engine)}
+    if database.replica_engine is not engine:
+        report["replica"] = await run_in_threadpool(_database_health, database.replica_engine)
+    for shard, shard_engine in enumerate(database.shard_engines[1:], start=1):
+        report[f"shard{shard}"] = await run_in_threadpool(_database_health, shard_engine)
+    if database.async_engine is not None:
+        report["async_pool"] = database.pool_status(database.async_engine.sync_engine)
+    report["hashing"] = hashing.stats()
+    if writer.write_queue is not None:
+        report["write_queue"] = writer.write_queue.stats()
+    databases = ["database", "replica"] + [f"shard{shard}" for shard in sharding.shards()]
+    ready = all(report[name]["ok"] for name in databases if name in report)
+    return metrics.TimedJSONResponse(dict(report, ready=ready), status_code=200 if ready else 503)
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    token_cache = auth.token_cache.stats()
+    gauges = {
+        "token_cache_hits_total": ("counter", token_cache["hits"]),
+        "token_cache_misses_total": ("counter", token_cache["misses"]),
+        "token_cache_evictions_total": ("counter", token_cache["evictions"]),
+        "token_cache_size": ("gauge", token_cache["size"]),
+        "password_hash_pending": ("gauge", hashing.stats()["pending"]),
+        "rate_limit_rejections_total": ("counter", ratelimit.limiter.rejections),
+        "task_events_subscribers": ("gauge", events.broker.stats()["subscribers"]),
+        "task_events_overflows_total": ("counter", events.broker.overflows),
+    }
+    if response_cache.maxsize > 0:
+        cached = response_cache.stats()
+        gauges.update({
+            "response_cache_hits_total": ("counter", cached["hits"]),
+            "response_cache_misses_total": ("counter", cached["misses"]),
+            "response_cache_evictions_total": ("counter", cached["evictions"]),
+            "response_cache_size": ("gauge", cached["size"]),
+        })
+    return PlainTextResponse(metrics.render_prometheus(gauges), media_type="text/plain; version=0.0.4")
 
 # Authentication endpoints
-@app.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
+@router.post("/token", response_model=schemas.Token, dependencies=[Depends(ratelimit.limit_login)])
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await auth.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -39,86 +105,377 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     return {"access_token": access_token, "token_type": "bearer"}
 
 # User endpoints
-@app.post("/users/", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db, username=user.username)
+@router.post("/users/", response_model=schemas.User, dependencies=[Depends(ratelimit.limit_signup)])
+async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    db_user = await run_db(db, crud.get_user_by_username, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return crud.create_user(db=db, user=user)
+    hashed_password = await hashing.hash_password(user.password)
+    return await run_write(db, crud.create_user, user=user, hashed_password=hashed_password)
 
-@app.get("/users/me/", response_model=schemas.User)
-def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
+@router.get("/users/me/", response_model=schemas.User)
+async def read_users_me(current_user: auth.Principal = Depends(ratelimit.limited_user)):
     return current_user
 
+# Admin endpoints
+@router.get("/admin/token-cache")
+async def read_token_cache_stats(current_user: auth.Principal = Depends(ratelimit.limited_user)):
+    utils.check_admin_privileges(current_user)
+    return auth.token_cache.stats()
+
+@router.get("/admin/analytics", response_model=schemas.TaskAnalytics)
+async def read_task_analytics(
+    days: int = Query(30, ge=1, le=366),
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
+):
+    utils.check_admin_privileges(current_user)
+    return await run_db(db, crud.get_task_analytics, days=days)
+
 # Task endpoints
-@app.post("/tasks/", response_model=schemas.Task)
-def create_task(
+@router.post("/tasks/", response_model=schemas.Task)
+async def create_task(
     task: schemas.TaskCreate, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
 ):
-    return crud.create_task(db=db, task=task, owner_id=current_user.id)
+    return await run_write(db, crud.create_task, task=task, owner_id=current_user.id)
+
+# Conditional GET for task reads. The ETag covers the reader's task list
+# version, path and query; the version is read before the data, so a racing
+# write can only leave a cached body unreachable, never serve it as current.
+response_cache = TTLCache(maxsize=config.RESPONSE_CACHE_SIZE, ttl=config.RESPONSE_CACHE_TTL)
+CACHE_HEADERS = {"Cache-Control": "private, no-cache"}
+
+async def _task_read_etag(request: Request, db, current_user: auth.Principal):
+    if current_user.role == "admin":
+        scope, version = "all", await run_db(db, crud.get_global_task_version)
+    else:
+        scope, version = current_user.id, await run_db(db, crud.get_task_version, owner_id=current_user.id)
+    return utils.make_etag(scope, version, request.url)
+
+def _not_modified_or_cached(request: Request, etag: str):
+    if utils.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=dict(CACHE_HEADERS, ETag=etag))
+    cached = response_cache.get(etag) if response_cache.maxsize > 0 else None
+    if cached is not None:
+        body, headers = cached
+        return Response(body, media_type="application/json", headers=headers)
+    return None
 
-@app.get("/tasks/", response_model=List[schemas.Task])
-def read_tasks(
+def _respond(response: Response, etag: str, content, schema=None):
+    """Tag the response and render it here when the body is cached or already plain data.
+
+    ORM `content` is validated through `schema`; without a schema it is the
+    fast path's plain dicts and goes straight to the JSON encoder.
+    """
+    headers = dict(CACHE_HEADERS, ETag=etag)
+    if schema is not None and response_cache.maxsize <= 0:
+        response.headers.update(headers)
+        return content
+    headers.update((key, value) for key, value in response.headers.items() if key in ("link", "x-next-cursor"))
+    metrics.start_serialization()
+    if schema is None:
+        rendered = metrics.FastJSONResponse(content, headers=headers)
+    else:
+        rendered = metrics.TimedJSONResponse(jsonable_encoder(parse_obj_as(schema, content)), headers=headers)
+    if response_cache.maxsize > 0 and len(rendered.body) <= config.RESPONSE_CACHE_MAX_BYTES:
+        response_cache.set(etag, (rendered.body, headers))
+    return rendered
+
+def _set_next_page(request: Request, response: Response, last_id: Optional[int]):
+    if last_id is None:
+        return
+    next_cursor = utils.encode_cursor(last_id)
+    next_url = request.url.remove_query_params("skip").include_query_params(cursor=next_cursor)
+    response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+@router.get("/tasks/", response_model=List[schemas.Task])
+async def read_tasks(
+    request: Request,
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    cursor: Optional[str] = None,
+    status: Optional[List[schemas.StatusEnum]] = Query(None),
+    q: Optional[str] = None,
+    title_prefix: Optional[str] = None,
+    sort: schemas.TaskSort = schemas.TaskSort.id,
+    as_of: Optional[datetime] = None,
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
 ):
+    filters = schemas.TaskFilter(status=status, q=q, title_prefix=title_prefix, sort=sort)
+    keyset = sort in (schemas.TaskSort.id, schemas.TaskSort.id_desc)
+
+    # A cursor switches to keyset pagination and takes precedence over skip
+    after_id = None
+    if cursor:
+        if not keyset:
+            raise HTTPException(status_code=400, detail="Cursor pagination requires sort=id or sort=-id")
+        after_id = utils.decode_cursor(cursor)
+
     # If admin, return all tasks; otherwise return only the user's tasks
-    if current_user.role == "admin":
-        tasks = crud.get_tasks(db, skip=skip, limit=limit)
+    owner_id = None if current_user.role == "admin" else current_user.id
+    if as_of is not None:
+        # Replayed from the revision log: id order, no filters, no ETag
+        if filters != schemas.TaskFilter():
+            raise HTTPException(status_code=400, detail="as_of reads only support skip/limit/cursor")
+        tasks = await run_db(
+            db, crud.get_tasks_as_of, as_of=as_of, owner_id=owner_id, skip=skip, limit=limit, after_id=after_id
+        )
+        _set_next_page(request, response, tasks[-1]["id"] if len(tasks) == limit > 0 else None)
+        return tasks
+
+    etag = await _task_read_etag(request, db, current_user)
+    cached = _not_modified_or_cached(request, etag)
+    if cached is not None:
+        return cached
+
+    if config.FAST_JSON:
+        tasks = await run_db(
+            db, crud.get_task_rows, owner_id=owner_id, skip=skip, limit=limit, after_id=after_id, filters=filters
+        )
+    elif owner_id is None:
+        tasks = await run_db(db, crud.get_tasks, skip=skip, limit=limit, after_id=after_id, filters=filters)
     else:
-        tasks = crud.get_user_tasks(db, owner_id=current_user.id, skip=skip, limit=limit)
-    return tasks
+        tasks = await run_db(
+            db, crud.get_user_tasks, owner_id=owner_id,
+            skip=skip, limit=limit, after_id=after_id, filters=filters
+        )
 
-@app.get("/tasks/{task_id}", response_model=schemas.Task)
-def read_task(
-    task_id: int, 
+    # A full page means there may be more rows; hand out the cursor for the next one
+    if keyset and limit > 0 and len(tasks) == limit:
+        _set_next_page(request, response, tasks[-1]["id"] if config.FAST_JSON else tasks[-1].id)
+    return _respond(response, etag, tasks, None if config.FAST_JSON else List[schemas.Task])
+
+@router.get("/tasks/search", response_model=List[schemas.Task])
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = 0,
+    limit: int = Query(50, le=500),
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
+):
+    owner_id = None if current_user.role == "admin" else current_user.id
+    return await run_db(db, crud.search_tasks, q=q, owner_id=owner_id, skip=skip, limit=limit)
+
+@router.get("/tasks/stats", response_model=schemas.TaskStats)
+async def read_task_stats(
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
+):
+    owner_id = None if current_user.role == "admin" else current_user.id
+    return await run_db(db, crud.get_task_stats, owner_id=owner_id)
+
+@router.get("/tasks/export")
+async def export_tasks(
+    format: schemas.ExportFormat = schemas.ExportFormat.ndjson,
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
+):
+    # Rows are streamed in yield_per batches as plain tuples, skipping ORM and
+    # pydantic object construction, so memory stays flat regardless of table size
+    owner_id = None if current_user.role == "admin" else current_user.id
+    columns = crud.EXPORT_COLUMNS
+
+    as_csv = format == schemas.ExportFormat.csv
+    header = utils.encode_csv_rows([], columns) if as_csv else ""
+
+    def encode(rows):
+        return utils.encode_csv_rows(rows) if as_csv else utils.encode_ndjson_rows(columns, rows)
+
+    if is_async_session(db):
+        async def body():
+            yield header
+            result = await db.stream(crud.task_export_statement(owner_id))
+            async for rows in result.partitions():
+                yield encode(rows)
+    else:
+        def body():
+            yield header
+            for rows in crud.iter_task_rows(db, owner_id):
+                yield encode(rows)
+
+    media_type = "text/csv" if as_csv else "application/x-ndjson"
+    filename = f"tasks.{format.value}"
+    return StreamingResponse(
+        body(), media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/tasks/events")
+async def task_events(
+    last_event_id: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
 ):
-    task = crud.get_task(db, task_id=task_id)
+    """Server-Sent Events feed of task.created/task.updated/task.deleted for the visible tasks"""
+    # The stream can stay open for hours; don't pin the connection authentication may have used
+    if is_async_session(db):
+        await db.close()
+    else:
+        db.close()
+
+    owner_id = None if current_user.role == "admin" else current_user.id
+    subscription = events.broker.subscribe(owner_id, last_event_id)
+
+    async def body():
+        try:
+            async for frame in subscription.frames(config.EVENTS_HEARTBEAT):
+                yield frame
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Bulk endpoints (declared before /tasks/{task_id} so "bulk" is not parsed as an id)
+def _check_batch_size(items):
+    if len(items) > config.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batches are limited to {config.BULK_MAX_ITEMS} items",
+        )
+
+@router.post("/tasks/bulk", response_model=List[schemas.BulkItemResult])
+async def create_tasks_bulk(
+    tasks: List[schemas.TaskCreate],
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
+):
+    _check_batch_size(tasks)
+    return await run_write(db, crud.create_tasks, tasks=tasks, owner_id=current_user.id)
+
+@router.patch("/tasks/bulk", response_model=List[schemas.BulkItemResult])
+async def update_tasks_bulk(
+    patches: List[schemas.TaskPatch],
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
+):
+    _check_batch_size(patches)
+    owner_id = None if current_user.role == "admin" else current_user.id
+    return await run_write(db, crud.update_tasks, patches=patches, owner_id=owner_id)
+
+@router.delete("/tasks/bulk", response_model=List[schemas.BulkItemResult])
+async def delete_tasks_bulk(
+    payload: schemas.TaskBulkDelete,
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
+):
+    _check_batch_size(payload.ids)
+    owner_id = None if current_user.role == "admin" else current_user.id
+    return await run_write(db, crud.delete_tasks, task_ids=payload.ids, owner_id=owner_id)
+
+async def _check_history_access(db, task_id: int, current_user: auth.Principal):
+    # Soft-deleted tasks keep their owner, so their history stays private too
+    owner_id = await run_db(db, crud.get_task_owner, task_id=task_id)
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if current_user.role != "admin" and owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to access this task")
+    return owner_id
+
+@router.get("/tasks/{task_id}/history", response_model=List[schemas.TaskRevision])
+async def read_task_history(
+    task_id: int,
+    skip: int = 0,
+    limit: int = Query(100, le=1000),
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
+):
+    """Revisions of a task, oldest first, including its deletion"""
+    await _check_history_access(db, task_id, current_user)
+    return await run_db(db, crud.get_task_history, task_id=task_id, skip=skip, limit=limit)
+
+@router.get("/tasks/{task_id}", response_model=schemas.Task)
+async def read_task(
+    task_id: int, 
+    request: Request,
+    response: Response,
+    as_of: Optional[datetime] = None,
+    db: Session = Depends(get_read_db),
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
+):
+    if as_of is not None:
+        owner_id = await _check_history_access(db, task_id, current_user)
+        task = await run_db(db, crud.get_task_as_of, task_id=task_id, owner_id=owner_id, as_of=as_of)
+        if task is None:
+            raise HTTPException(status_code=404, detail="Task did not exist at as_of")
+        return task
+
+    # A matching ETag implies this reader already saw the task, so the
+    # ownership check below passed for it at this same version
+    etag = await _task_read_etag(request, db, current_user)
+    cached = _not_modified_or_cached(request, etag)
+    if cached is not None:
+        return cached
+
+    task = await run_db(db, crud.get_task, task_id=task_id)
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
         
     # Check if user is admin or task owner
     if current_user.role != "admin" and task.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to access this task")
-    return task
+    return _respond(response, etag, task, schemas.Task)
+
+async def _raise_write_denied(db, task_id: int, action: str):
+    # Only reached when the fused write matched no row: tell "missing" from "not yours"
+    if not await run_db(db, crud.task_exists, task_id=task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+    raise HTTPException(status_code=403, detail=f"Not authorized to {action} this task")
 
-@app.put("/tasks/{task_id}", response_model=schemas.Task)
-def update_task(
+@router.put("/tasks/{task_id}", response_model=schemas.Task)
+async def update_task(
     task_id: int, 
     task: schemas.TaskUpdate, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
 ):
-    db_task = crud.get_task(db, task_id=task_id)
+    # Ownership is part of the WHERE clause of the write (crud.update_task reads the row under the same filter)
+    owner_id = None if current_user.role == "admin" else current_user.id
+    db_task = await run_write(db, crud.update_task, task_id=task_id, task_data=task, owner_id=owner_id)
     if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-        
-    # Check if user is admin or task owner
-    if current_user.role != "admin" and db_task.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this task")
-    
-    return crud.update_task(db=db, task_id=task_id, task_data=task)
+        await _raise_write_denied(db, task_id, "update")
+    return db_task
 
-@app.delete("/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(
+@router.delete("/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_task(
     task_id: int, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: auth.Principal = Depends(ratelimit.limited_user)
 ):
-    db_task = crud.get_task(db, task_id=task_id)
-    if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-        
-    # Check if user is admin or task owner
-    if current_user.role != "admin" and db_task.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this task")
-    
-    if not crud.delete_task(db, task_id=task_id):
-        raise HTTPException(status_code=500, detail="Failed to delete task")
-    return None
\ No newline at end of file
+    owner_id = None if current_user.role == "admin" else current_user.id
+    if not await run_write(db, crud.delete_task, task_id=task_id, owner_id=owner_id):
+        await _raise_write_denied(db, task_id, "delete")
+    return None
+
+async def _shard_moving(request: Request, exc: sharding.ShardMoving):
+    return metrics.TimedJSONResponse(
+        {"detail": "Tasks are being moved to another shard, try again shortly"},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(config.SHARD_MOVE_DRAIN)},
+    )
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="Task Manager API", default_response_class=metrics.TimedJSONResponse)
+    # FastAPI 0.88 takes no lifespan argument; Starlette's router does the work either way
+    app.router.lifespan_context = lifespan
+
+    # Configure CORS for frontend
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Update this with your frontend URL in production
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["ETag", "Link", "X-Next-Cursor", "Server-Timing"],
+    )
+    app.add_middleware(metrics.MetricsMiddleware, server_timing=config.SERVER_TIMING)
+    app.add_exception_handler(sharding.ShardMoving, _shard_moving)
+    app.include_router(router)
+    return app
+
+app = create_app()
@@ -0,0 +1,261 @@
+"""Request-level performance instrumentation.
+
+``MetricsMiddleware`` times every request and, through SQLAlchemy event hooks
+installed by ``instrument_engine``, attributes database query count/time and
+connection-pool wait time to the request being served. Serialization is
+timed from the moment an endpoint returns (``TimedRoute``), so FastAPI's
+response_model validation and ``jsonable_encoder`` count towards it, until
+``TimedJSONResponse`` has rendered the body. Aggregates are exposed in the Prometheus text
+format by ``render_prometheus`` and, optionally, per response as a
+``Server-Timing`` header.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from . import utils
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class RequestStats:
+    __slots__ = ("db_queries", "db_time", "pool_wait", "serialize_time", "serialize_start")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self.serialize_time = 0.0
+        self.serialize_start = None
+
+# Mutable per-request accumulator; copies of the context (threadpool, run_sync)
+# share the same object so their work is attributed to the request
+_current = contextvars.ContextVar("request_stats", default=None)
+
+def current_stats():
+    return _current.get()
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: (histogram.buckets, list(histogram.counts), histogram.sum, histogram.count)
+                for key, histogram in self._histograms.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+registry = Registry()
+
+HELP = {
+    "http_request_duration_seconds": "Wall time spent serving a request",
+    "http_request_db_queries": "SQL statements executed per request",
+    "http_request_db_duration_seconds": "Time spent executing SQL per request",
+    "http_request_db_pool_wait_seconds": "Time spent waiting for a pooled connection per request",
+    "http_request_serialization_seconds": "Time spent validating, converting and encoding the response body per request",
+}
+
+# SQLAlchemy hooks
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_start
+    stats = _current.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_time += elapsed
+
+def _instrument_pool(pool):
+    do_get = pool._do_get
+
+    def timed_do_get():
+        start = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                stats.pool_wait += time.perf_counter() - start
+
+    pool._do_get = timed_do_get
+
+def instrument_engine(engine):
+    """Attach query and pool-wait timing to a (sync) Engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _instrument_pool(engine.pool)
+
+def start_serialization():
+    """Count the time from now until the next response body is rendered as serialization"""
+    stats = _current.get()
+    if stats is not None:
+        stats.serialize_start = time.perf_counter()
+
+def _timed_endpoint(call):
+    def returned(result):
+        # A Response is already rendered; anything else still goes through FastAPI's serialize_response
+        if not isinstance(result, Response):
+            start_serialization()
+        return result
+
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(*args, **kwargs):
+            return returned(await call(*args, **kwargs))
+    else:
+        @functools.wraps(call)
+        def endpoint(*args, **kwargs):
+            return returned(call(*args, **kwargs))
+    return endpoint
+
+class TimedRoute(APIRoute):
+    """Route whose serialization time starts when the endpoint returns, not when the body is encoded"""
+
+    def get_route_handler(self):
+        self.dependant.call = _timed_endpoint(self.dependant.call)
+        return super().get_route_handler()
+
+class TimedJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        stats = _current.get()
+        start = time.perf_counter()
+        if stats is not None and stats.serialize_start is not None:
+            start, stats.serialize_start = stats.serialize_start, None
+        body = self.encode(content)
+        if stats is not None:
+            stats.serialize_time += time.perf_counter() - start
+        return body
+
+    def encode(self, content) -> bytes:
+        return super().render(content)
+
+class FastJSONResponse(TimedJSONResponse):
+    """For already-plain content (dicts of column values): skips jsonable_encoder, uses orjson if available"""
+
+    def encode(self, content) -> bytes:
+        return utils.dumps_json(content)
+
+def _server_timing(stats, total):
+    return (
+        f"app;dur={total * 1000:.2f}, "
+        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.db_queries} queries", '
+        f"pool;dur={stats.pool_wait * 1000:.2f}, "
+        f"serialize;dur={stats.serialize_time * 1000:.2f}"
+    ).encode()
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so it adds no extra task or body buffering per request"""
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+        self._route_paths = None
+
+    def _route_path(self, scope):
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            self._route_paths = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        return self._route_paths.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(stats, time.perf_counter() - start)))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - start
+            route = self._route_path(scope)
+            labels = {"method": scope["method"], "route": route}
+            registry.observe("http_request_duration_seconds", dict(labels, status=str(status_code)), elapsed)
+            registry.observe("http_request_db_queries", labels, stats.db_queries, COUNT_BUCKETS)
+            registry.observe("http_request_db_duration_seconds", labels, stats.db_time)
+            registry.observe("http_request_db_pool_wait_seconds", labels, stats.pool_wait)
+            registry.observe("http_request_serialization_seconds", labels, stats.serialize_time)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+def render_prometheus(gauges=None):
+    """Render all histograms (plus optional {name: value} gauges/counters) in Prometheus text format"""
+    lines = []
+    by_name = {}
+    for (name, labels), data in registry.snapshot().items():
+        by_name.setdefault(name, []).append((labels, data))
+
+    for name in sorted(by_name):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, (buckets, counts, total, count) in sorted(by_name[name]):
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    for name, (kind, value) in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
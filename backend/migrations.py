@@ -0,0 +1,202 @@
+"""Versioned schema migrations.
+
+Each migration is idempotent (it inspects the live schema before changing it)
+so it can be applied both to a fresh database and to one created by the old
+startup-time ``create_all``. Applied versions are recorded in ``schema_version``.
+
+Usage:
+    python -m backend.migrations upgrade [--url URL]
+    python -m backend.migrations current [--url URL]
+    python -m backend.migrations recount [--url URL]
+"""
+import argparse
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, cast, delete, exists, func, inspect, select
+
+from . import crud, models, search, sharding
+from .database import create_db_engine, engine as default_engine, shard_engines
+
+version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("applied_at", DateTime),
+)
+
+def _has_index(conn, table_name, index_name):
+    return any(ix["name"] == index_name for ix in inspect(conn).get_indexes(table_name))
+
+def _create_missing_indexes(conn, table):
+    for index in table.indexes:
+        if not _has_index(conn, table.name, index.name):
+            index.create(conn)
+
+def _initial_schema(conn):
+    models.Base.metadata.create_all(
+        conn, tables=[models.User.__table__, models.Task.__table__]
+    )
+
+# Task listing indexes as migration 2 created them; migration 5 replaces them with partial ones
+_FULL_LISTING_INDEXES = {"ix_tasks_owner_id_id": "owner_id, id", "ix_tasks_owner_id_status_id": "owner_id, status, id"}
+
+def _listing_indexes(conn):
+    _create_missing_indexes(conn, models.User.__table__)
+    for name, columns in _FULL_LISTING_INDEXES.items():
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON tasks ({columns})")
+
+def _task_versions(conn):
+    models.Base.metadata.create_all(conn, tables=[models.TaskVersion.__table__])
+
+def _task_search_index(conn):
+    search.create_index(conn)
+
+def _backfill_revisions(conn, batch_size=10_000):
+    """A baseline 'created' revision, dated now, for every task that has none"""
+    tasks, revisions = models.Task.__table__, models.TaskRevision.__table__
+    now = datetime.utcnow()
+    stmt = (
+        select(tasks.c.id, tasks.c.title, tasks.c.description, tasks.c.status)
+        .where(tasks.c.deleted_at.is_(None), ~exists().where(revisions.c.task_id == tasks.c.id))
+        .order_by(tasks.c.id)
+    )
+    for rows in conn.execute(stmt.execution_options(yield_per=batch_size)).partitions():
+        conn.execute(revisions.insert(), [
+            crud.revision_row(row.id, "created", crud.task_changes(row._asdict()), now) for row in rows
+        ])
+
+def _soft_delete_and_revisions(conn):
+    table = models.Task.__table__
+    if "deleted_at" not in {column["name"] for column in inspect(conn).get_columns("tasks")}:
+        column_type = table.c.deleted_at.type.compile(conn.dialect)
+        conn.exec_driver_sql(f"ALTER TABLE tasks ADD COLUMN deleted_at {column_type}")
+    _create_missing_indexes(conn, table)
+    for name in _FULL_LISTING_INDEXES:
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    models.Base.metadata.create_all(conn, tables=[models.TaskRevision.__table__])
+    _backfill_revisions(conn)
+
+def _live_status_counts():
+    tasks = models.Task.__table__
+    return (
+        select(tasks.c.owner_id, cast(tasks.c.status, String), func.count())
+        .where(tasks.c.deleted_at.is_(None), tasks.c.owner_id.is_not(None))
+        .group_by(tasks.c.owner_id, tasks.c.status)
+    )
+
+def task_counter_drift(conn):
+    """{(owner_id, status): (counter, actual)} wherever task_status_counts disagrees with counting the live tasks"""
+    counts = models.TaskStatusCount.__table__
+    counters = {(owner_id, status): count for owner_id, status, count in conn.execute(
+        select(counts.c.owner_id, counts.c.status, counts.c.count).where(counts.c.count != 0)
+    )}
+    actual = {(owner_id, status): count for owner_id, status, count in conn.execute(_live_status_counts())}
+    return {
+        key: (counters.get(key, 0), actual.get(key, 0))
+        for key in counters.keys() | actual.keys() if counters.get(key, 0) != actual.get(key, 0)
+    }
+
+def recount_task_statuses(conn):
+    """Rebuild task_status_counts from the live tasks"""
+    status_counts = models.TaskStatusCount.__table__
+    conn.execute(delete(status_counts))
+    conn.execute(status_counts.insert().from_select(["owner_id", "status", "count"], _live_status_counts()))
+
+def _task_counters(conn):
+    """Analytics counter tables, rebuilt from the live tasks and their 'created' revisions"""
+    tasks, revisions = models.Task.__table__, models.TaskRevision.__table__
+    status_counts, daily_counts = models.TaskStatusCount.__table__, models.TaskDailyCount.__table__
+    models.Base.metadata.create_all(conn, tables=[status_counts, daily_counts])
+    conn.execute(delete(daily_counts))
+    recount_task_statuses(conn)
+    # Tasks from before migration 5 only have a baseline revision, so they count as created that day
+    day = func.date(revisions.c.changed_at)
+    conn.execute(daily_counts.insert().from_select(
+        ["day", "owner_id", "created"],
+        select(day, tasks.c.owner_id, func.count())
+        .select_from(revisions.join(tasks, tasks.c.id == revisions.c.task_id))
+        .where(revisions.c.op == "created", tasks.c.owner_id.is_not(None))
+        .group_by(day, tasks.c.owner_id),
+    ))
+
+def _shard_map(conn):
+    models.Base.metadata.create_all(
+        conn, tables=[models.ShardAssignment.__table__, models.TaskIdSequence.__table__]
+    )
+
+# (version, description, upgrade function) in application order
+MIGRATIONS = [
+    (1, "initial users/tasks schema", _initial_schema),
+    (2, "owner/status listing indexes and username index", _listing_indexes),
+    (3, "per-owner task version counters for ETags", _task_versions),
+    (4, "tasks_fts full-text index on SQLite", _task_search_index),
+    (5, "soft delete with partial listing indexes, task revision log", _soft_delete_and_revisions),
+    (6, "task status and daily created counters for analytics", _task_counters),
+    (7, "task shard map and per-shard task id sequences", _shard_map),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def applied_version(conn):
+    """Read-only version check: None when the schema has never been migrated"""
+    if not inspect(conn).has_table("schema_version"):
+        return None
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+def current_version(conn):
+    version_metadata.create_all(conn)
+    versions = conn.execute(select(schema_version.c.version)).scalars().all()
+    return max(versions, default=0)
+
+def upgrade(engine=None, target=None):
+    """Apply all pending migrations up to `target` (default: latest). Returns the new version."""
+    engine = engine or default_engine
+    with engine.begin() as conn:
+        version = current_version(conn)
+    for number, description, migrate in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        # One transaction per migration so a failure leaves a consistent version
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_version.insert().values(
+                version=number, description=description, applied_at=datetime.utcnow()
+            ))
+        version = number
+    return version
+
+def upgrade_all(target=None):
+    """upgrade() the main database and every task shard, then set up the shards' task id sequences"""
+    versions = [upgrade(shard_engine, target) for shard_engine in shard_engines]
+    if sharding.enabled():
+        sharding.prepare()
+    return min(versions)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the task manager database schema")
+    parser.add_argument("command", choices=["upgrade", "current", "recount"])
+    parser.add_argument("--target", type=int, default=None, help="stop at this schema version")
+    parser.add_argument("--url", default=None, help="database URL (default: TASKS_DATABASE_URL and every task shard)")
+    args = parser.parse_args(argv)
+
+    engine = create_db_engine(args.url) if args.url else default_engine
+    if args.command == "upgrade":
+        version = upgrade(engine, target=args.target) if args.url else upgrade_all(target=args.target)
+        print(f"schema at version {version}")
+    elif args.command == "recount":
+        # Counters should never drift; report any that did and rebuild them
+        for shard_engine in [engine] if args.url else shard_engines:
+            with shard_engine.begin() as conn:
+                drift = task_counter_drift(conn)
+                for (owner_id, status), (counter, actual) in sorted(drift.items()):
+                    print(f"{shard_engine.url}: owner {owner_id} {status}: counter {counter}, actual {actual}")
+                recount_task_statuses(conn)
+            print(f"{shard_engine.url}: {len(drift)} status counters rebuilt" if drift else f"{shard_engine.url}: counters ok")
+    else:
+        with engine.begin() as conn:
+            print(f"schema at version {current_version(conn)}")
+
+if __name__ == "__main__":
+    main()
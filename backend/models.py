@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Enum, Index, Text, text
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
@@ -11,18 +11,79 @@ class StatusEnum(str, enum.Enum):
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True)
-    username = Column(String, unique=True)
+    username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     role = Column(String, default="user")
 
     tasks = relationship("Task", back_populates="owner")
 
+# Soft-deleted tasks keep their row (for history) but are left out of the listing indexes
+LIVE_TASKS = text("deleted_at IS NULL")
+
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Per-user listing ordered by id, optionally narrowed by status
+        Index("ix_tasks_live_owner_id_id", "owner_id", "id", sqlite_where=LIVE_TASKS, postgresql_where=LIVE_TASKS),
+        Index(
+            "ix_tasks_live_owner_id_status_id", "owner_id", "status", "id",
+            sqlite_where=LIVE_TASKS, postgresql_where=LIVE_TASKS,
+        ),
+    )
     id = Column(Integer, primary_key=True)
     title = Column(String)
     description = Column(String)
-    status = Column(Enum(StatusEnum), default=StatusEnum.pending)
+    # Named so PostgreSQL creates a proper ENUM type
+    status = Column(Enum(StatusEnum, name="task_status"), default=StatusEnum.pending)
     owner_id = Column(Integer, ForeignKey("users.id"))
+    deleted_at = Column(DateTime, nullable=True)
+
+    owner = relationship("User", back_populates="tasks")
+
+class TaskVersion(Base):
+    """Per-owner counter bumped by every task write; backs the ETags on task reads"""
+    __tablename__ = "task_versions"
+    owner_id = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False, default=0)
+
+class TaskRevision(Base):
+    """Append-only task change log; each row holds only the fields its write changed"""
+    __tablename__ = "task_revisions"
+    __table_args__ = (Index("ix_task_revisions_task_id_changed_at", "task_id", "changed_at"),)
+    id = Column(Integer, primary_key=True)
+    # No foreign key, so writing the log never depends on the task row
+    task_id = Column(Integer, nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+    op = Column(String, nullable=False)  # created / updated / deleted
+    changes = Column(Text, nullable=False)  # compact JSON of the new values
+
+# Analytics counters, kept up to date by every task write in crud so reports
+# read O(users) rows instead of scanning tasks
+class TaskStatusCount(Base):
+    """Live (not deleted) tasks per owner and status"""
+    __tablename__ = "task_status_counts"
+    owner_id = Column(Integer, primary_key=True, autoincrement=False)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class TaskDailyCount(Base):
+    """Tasks created per UTC day and owner; deleting a task does not take it back out"""
+    __tablename__ = "task_daily_counts"
+    day = Column(Date, primary_key=True)
+    owner_id = Column(Integer, primary_key=True, autoincrement=False)
+    created = Column(Integer, nullable=False, default=0)
+
+# Sharding (see backend/sharding.py)
+class ShardAssignment(Base):
+    """Which shard holds an owner's tasks; owners without a row are on shard 0"""
+    __tablename__ = "task_shards"
+    owner_id = Column(Integer, primary_key=True, autoincrement=False)
+    shard = Column(Integer, nullable=False)
+    # Set while the owner is being moved: their task writes are refused until the move finishes
+    moving = Column(Boolean, nullable=False, default=False)
 
-    owner = relationship("User", back_populates="tasks")
\ No newline at end of file
+class TaskIdSequence(Base):
+    """One row per shard database: the next task id it hands out, from that shard's own id range"""
+    __tablename__ = "task_id_sequences"
+    shard = Column(Integer, primary_key=True, autoincrement=False)
+    next_id = Column(Integer, nullable=False)
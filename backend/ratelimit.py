@@ -0,0 +1,160 @@
+"""Token-bucket rate limiting.
+
+Every authenticated request spends one token from its user's bucket
+(``limited_user``). Logins spend from a bucket keyed by username
+(``limit_login``), which is what stops password brute-forcing. ``/token`` and
+``/users/`` also spend from a much larger bucket keyed by client IP: every
+user of the Streamlit frontend shares the frontend server's address, so a
+tight per-IP limit would let a few failed logins lock them all out. Buckets
+refill continuously at ``rate`` tokens per second up to ``burst``. Rejected
+requests get a 429 with ``Retry-After``.
+
+State lives in process memory by default: O(1) per check, but each worker
+enforces its own limits. Set ``TASKS_RATE_LIMIT_REDIS_URL`` to keep buckets in
+Redis (or any server speaking its protocol and Lua scripting) so the limits
+hold across workers and hosts; each check is then one atomic script call. If
+the shared backend is unreachable, requests are let through rather than failed.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+
+from . import auth, config
+
+logger = logging.getLogger(__name__)
+
+class MemoryBackend:
+    """Buckets in an LRU-bounded dict; an evicted key simply starts again with a full bucket"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def acquire(self, key, rate: float, burst: int, cost: int = 1):
+        """Take `cost` tokens; returns (allowed, seconds until they would be available)"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = burst
+                while len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                self._buckets.move_to_end(key)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    async def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+# Refill, spend and store atomically; idle buckets expire once they would be full again
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = burst
+    ts = now
+end
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local retry = 0
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(retry)}
+"""
+
+class RedisBackend:
+    def __init__(self, url: str, prefix: str = "tasks:ratelimit:"):
+        # Optional dependency, only needed when a shared backend is configured
+        import redis.asyncio
+
+        self.client = redis.asyncio.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(TOKEN_BUCKET_LUA)
+
+    async def acquire(self, key, rate: float, burst: int, cost: int = 1):
+        try:
+            allowed, retry = await self._script(keys=[self.prefix + key], args=[rate, burst, time.time(), cost])
+        except Exception:
+            logger.warning("rate limit backend unavailable, allowing request", exc_info=True)
+            return True, 0.0
+        return bool(allowed), float(retry)
+
+    async def reset(self):
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(key)
+
+class RateLimiter:
+    def __init__(self, backend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.rejections = 0
+
+    async def check(self, key: str, rate: float, burst: int):
+        """Raise 429 when the bucket `key` is empty"""
+        if not self.enabled:
+            return
+        allowed, retry_after = await self.backend.acquire(key, rate, burst)
+        if not allowed:
+            self.rejections += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded, try again later",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+def _backend():
+    if config.RATE_LIMIT_REDIS_URL:
+        return RedisBackend(config.RATE_LIMIT_REDIS_URL)
+    return MemoryBackend(max_keys=config.RATE_LIMIT_MAX_KEYS)
+
+limiter = RateLimiter(_backend(), enabled=config.RATE_LIMIT)
+
+def client_ip(request: Request) -> str:
+    if config.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+async def limited_user(current_user: auth.Principal = Depends(auth.get_current_user)):
+    """get_current_user plus one token from the user's bucket"""
+    await limiter.check(f"user:{current_user.id}", config.RATE_LIMIT_USER_PER_SECOND, config.RATE_LIMIT_USER_BURST)
+    return current_user
+
+async def _limit_ip(key: str):
+    if config.RATE_LIMIT_IP_PER_MINUTE > 0:
+        await limiter.check(key, config.RATE_LIMIT_IP_PER_MINUTE / 60, config.RATE_LIMIT_IP_BURST)
+
+async def limit_signup(request: Request):
+    """Per-IP bucket for account creation (bcrypt-heavy and unauthenticated)"""
+    await _limit_ip(f"signup:{client_ip(request)}")
+
+async def limit_login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    """Per-username bucket, so many clients can't guess one password; the per-IP one only caps floods"""
+    await _limit_ip(f"login-ip:{client_ip(request)}")
+    await limiter.check(
+        f"login-user:{form_data.username}", config.RATE_LIMIT_LOGIN_PER_MINUTE / 60, config.RATE_LIMIT_LOGIN_BURST
+    )
@@ -1,5 +1,8 @@
-from pydantic import BaseModel
-from typing import List, Optional, Union
+import json
+from datetime import date, datetime
+
+from pydantic import BaseModel, validator
+from typing import Any, Dict, List, Optional, Union
 from enum import Enum
 
 class StatusEnum(str, Enum):
@@ -37,6 +40,46 @@ class TaskBase(BaseModel):
 class TaskCreate(TaskBase):
     pass
 
+class TaskSort(str, Enum):
+    id = "id"
+    id_desc = "-id"
+    title = "title"
+    title_desc = "-title"
+    status = "status"
+    status_desc = "-status"
+
+class TaskFilter(BaseModel):
+    status: Optional[List[StatusEnum]] = None
+    q: Optional[str] = None  # substring match on title
+    title_prefix: Optional[str] = None
+    sort: TaskSort = TaskSort.id
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+class TaskStats(BaseModel):
+    pending: int = 0
+    in_progress: int = 0
+    done: int = 0
+    total: int = 0
+
+class TaskCompletion(TaskStats):
+    completion_rate: float = 0.0  # done / total
+
+class UserTaskStats(TaskCompletion):
+    owner_id: int
+    username: Optional[str] = None
+
+class DailyTaskCount(BaseModel):
+    day: date
+    created: int = 0
+
+class TaskAnalytics(BaseModel):
+    totals: TaskCompletion
+    users: List[UserTaskStats]
+    created_per_day: List[DailyTaskCount]
+
 class TaskUpdate(TaskBase):
     status: StatusEnum = StatusEnum.pending
 
@@ -53,4 +96,40 @@ class Task(TaskBase):
         data = super().dict(**kwargs)
         if isinstance(data.get("status"), StatusEnum):
             data["status"] = data["status"].value
-        return data
\ No newline at end of file
+        return data
+
+class TaskRevision(BaseModel):
+    id: int
+    changed_at: datetime
+    op: str  # created / updated / deleted
+    changes: Dict[str, Any]  # the fields this revision set
+
+    class Config:
+        orm_mode = True
+
+    # Stored as compact JSON text
+    @validator("changes", pre=True)
+    def parse_changes(cls, value):
+        return json.loads(value) if isinstance(value, str) else value
+
+# Bulk task schemas
+class TaskPatch(BaseModel):
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[StatusEnum] = None
+
+    # Leaving a field out keeps it; title and status can't be cleared with null
+    @validator("title", "status", pre=True)
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
+class TaskBulkDelete(BaseModel):
+    ids: List[int]
+
+class BulkItemResult(BaseModel):
+    id: Optional[int] = None
+    status_code: int
+    detail: Optional[str] = None
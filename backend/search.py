@@ -0,0 +1,117 @@
+"""Full-text search over task titles and descriptions.
+
+On SQLite the ``tasks_fts`` FTS5 table indexes ``tasks.title`` and
+``tasks.description`` as an external-content table (it stores only the index,
+not a second copy of the text); triggers keep it in sync with every insert,
+update and delete, whether it comes from crud, bulk statements or raw SQL.
+The owner is indexed too, as a ``u<owner_id>`` token, so per-user searches
+intersect posting lists inside FTS5 instead of ranking every match in the
+table and filtering afterwards. Other databases fall back to substring
+matching in ``crud.search_tasks``.
+
+Usage:
+    python -m backend.search rebuild [--url URL]
+"""
+import argparse
+import re
+
+from sqlalchemy import column, table
+
+# Title matches weigh more than description matches in the bm25 ranking; the owner token not at all
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+tasks_fts = table("tasks_fts", column("rowid"))
+
+FTS_DDL = [
+    # The external content: what tasks_fts reads back on 'rebuild'
+    """CREATE VIEW IF NOT EXISTS tasks_fts_source AS
+        SELECT id, title, description, 'u' || owner_id AS owner FROM tasks""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, description, owner, content='tasks_fts_source', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description, owner)
+        VALUES (new.id, new.title, new.description, 'u' || new.owner_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description, owner)
+        VALUES ('delete', old.id, old.title, old.description, 'u' || old.owner_id);
+    END""",
+    # Status changes don't touch the index
+    """CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description, owner_id ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description, owner)
+        VALUES ('delete', old.id, old.title, old.description, 'u' || old.owner_id);
+        INSERT INTO tasks_fts(rowid, title, description, owner)
+        VALUES (new.id, new.title, new.description, 'u' || new.owner_id);
+    END""",
+]
+
+def fts_supported(conn):
+    return conn.dialect.name == "sqlite" and bool(
+        conn.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar()
+    )
+
+def create_index(conn):
+    """Create tasks_fts and its triggers (SQLite with FTS5 only) and index existing rows"""
+    if not fts_supported(conn):
+        return False
+    for statement in FTS_DDL:
+        conn.exec_driver_sql(statement)
+    rebuild(conn)
+    return True
+
+def rebuild(conn):
+    """Re-index every task from the tasks table, e.g. after bulk loads that bypassed the triggers"""
+    conn.exec_driver_sql("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
+
+def has_index(conn):
+    """Whether tasks_fts exists; a positive answer is remembered per DBAPI connection"""
+    if conn.dialect.name != "sqlite":
+        return False
+    if not conn.info.get("tasks_fts"):
+        conn.info["tasks_fts"] = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'"
+        ).first() is not None
+    return conn.info["tasks_fts"]
+
+# Words, optionally ending in * for a prefix search
+_TOKEN = re.compile(r"(\w+)(\*?)", re.UNICODE)
+
+def query_terms(q: str):
+    return [word for word, _ in _TOKEN.findall(q)]
+
+def match_expression(q: str, owner_id: int = None):
+    """Turn free text into a safe FTS5 query in which every word must match.
+
+    Every term is quoted, so FTS5 operators and punctuation in user input are
+    searched for literally instead of raising syntax errors, and terms only
+    match title/description. A trailing * makes a word a prefix search (opt-in:
+    short prefixes expand to many index terms). None when q has no words.
+    """
+    terms = ['"%s"%s' % (word, star) for word, star in _TOKEN.findall(q)]
+    if not terms:
+        return None
+    expression = "{title description} : (%s)" % " ".join(terms)
+    if owner_id is not None:
+        expression = 'owner : "u%d" AND %s' % (owner_id, expression)
+    return expression
+
+def main(argv=None):
+    from .database import create_db_engine, engine as default_engine
+
+    parser = argparse.ArgumentParser(description="Manage the task full-text index")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--url", default=None, help="database URL (default: TASKS_DATABASE_URL)")
+    args = parser.parse_args(argv)
+
+    engine = create_db_engine(args.url) if args.url else default_engine
+    with engine.begin() as conn:
+        if not has_index(conn):
+            parser.exit(1, "tasks_fts does not exist; run `python -m backend.migrations upgrade` first\n")
+        rebuild(conn)
+    print("tasks_fts rebuilt")
+
+if __name__ == "__main__":
+    main()
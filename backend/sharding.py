@@ -0,0 +1,421 @@
+"""Task data sharded across databases by owner.
+
+With ``TASKS_SHARDS=N`` every user's tasks, and everything derived from them
+(revisions, list versions, analytics counters, the FTS index), live in one of
+N databases. Shard 0 is the main database, which also keeps the users and the
+shard map (``task_shards``); shard n is ``TASKS_SHARD_URL_TEMPLATE``. Owners
+without a map row, i.e. everyone from before sharding was turned on, are on
+shard 0; new users are placed on the shard with the fewest users.
+
+crud calls ``route_owner``/``route_task`` before touching an owner's tasks,
+and the session (``database.ShardedSession``) then sends task statements to
+that shard while user queries keep going to the main database. Admin reads
+without an owner run on every shard in turn and merge the results. Each shard
+hands out task ids from its own range (``task_id_sequences``), so ids are
+unique across shards and a task keeps its id when its owner moves.
+
+Moving a user is online: their tasks and revisions are copied while writes go
+on, then the revisions written meanwhile are replayed onto the copy. Only the
+last catch-up runs with the user's writes refused (503 with ``Retry-After``)
+for ``TASKS_SHARD_MOVE_DRAIN`` seconds plus the copy time, after which the map
+is flipped and the source rows are deleted. Revision ids are renumbered on the
+target shard; their order is kept.
+
+Usage:
+    python -m backend.sharding status
+    python -m backend.sharding move --user ID --to SHARD [--drain SECONDS]
+    python -m backend.sharding rebalance [--max-moves N] [--dry-run]
+"""
+import argparse
+import importlib
+import json
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import String, cast, delete, func, insert, select, update
+
+from . import config, database, models
+from .cache import TTLCache
+
+# Shard n allocates task ids from [n * ID_RANGE + 1, (n + 1) * ID_RANGE); ids stay
+# below 2**53 (exact in JavaScript) for up to 8191 shards
+ID_RANGE = 2 ** 40
+
+# Per-process owner_id -> (shard, moving); an entry may be stale for up to the
+# TTL, which moves allow for by draining and cleaning up only after that long
+assignment_cache = TTLCache(maxsize=100_000 if config.SHARD_MAP_CACHE_TTL > 0 else 0, ttl=config.SHARD_MAP_CACHE_TTL)
+
+class ShardMoving(Exception):
+    """The owner's tasks are being moved to another shard; their writes can be retried shortly"""
+
+    def __init__(self, owner_id: int):
+        super().__init__(f"tasks of user {owner_id} are being moved to another shard")
+        self.owner_id = owner_id
+
+def enabled() -> bool:
+    return config.SHARDS > 1
+
+def shards():
+    return range(config.SHARDS)
+
+def origin_shard(task_id: int) -> int:
+    """The shard that allocated task_id, which is where it still lives unless its owner moved"""
+    return min(task_id // ID_RANGE, config.SHARDS - 1)
+
+# Routing a session
+@contextmanager
+def on_shard(db, shard: int):
+    """Pin db to one shard; crud functions called meanwhile work on that shard only"""
+    previous = db.info.get("shard"), db.info.get("pinned")
+    db.info["shard"], db.info["pinned"] = shard, True
+    try:
+        yield db
+    finally:
+        db.info["shard"], db.info["pinned"] = previous
+
+def fan_out(db) -> bool:
+    """True when an all-owners crud call has to visit every shard itself"""
+    return enabled() and not db.info.get("pinned")
+
+def each_shard(db, fn, *args, **kwargs):
+    """[fn(db, *args, **kwargs) on shard 0, on shard 1, ...]"""
+    results = []
+    for shard in shards():
+        with on_shard(db, shard):
+            results.append(fn(db, *args, **kwargs))
+    return results
+
+def _assignment(db, owner_id: int):
+    """(shard, moving) of owner_id, looked up at most once per session and cache TTL"""
+    cache = db.info.setdefault("shard_map", {})
+    if owner_id not in cache:
+        assignment = assignment_cache.get(owner_id)
+        if assignment is None:
+            table = models.ShardAssignment
+            row = db.execute(select(table.shard, table.moving).where(table.owner_id == owner_id)).first()
+            assignment = (row.shard, row.moving) if row else (0, False)
+            assignment_cache.set(owner_id, assignment)
+        cache[owner_id] = assignment
+    return cache[owner_id]
+
+def check_writable(db, owner_ids):
+    for owner_id in owner_ids:
+        if owner_id is not None and _assignment(db, owner_id)[1]:
+            raise ShardMoving(owner_id)
+
+def route_owner(db, owner_id: int, for_write: bool = False) -> int:
+    """Send db's task statements to owner_id's shard"""
+    if not enabled():
+        return 0
+    shard, moving = _assignment(db, owner_id)
+    if for_write and moving:
+        raise ShardMoving(owner_id)
+    db.info["shard"] = shard
+    return shard
+
+def locate(db, task_ids):
+    """{task_id: (shard, owner_id)} of the tasks among task_ids that exist, deleted or not.
+
+    Each id is looked for on the shard that allocated it first. A copy on a
+    shard its owner is not assigned to (half of a move) is skipped.
+    """
+    cache = db.info.setdefault("task_locations", {})
+    missing = {task_id for task_id in task_ids if task_id not in cache}
+    for probe in ("origin", "others"):
+        for shard in shards():
+            ids = [
+                task_id for task_id in missing
+                if (origin_shard(task_id) == shard) == (probe == "origin")
+            ]
+            if not ids:
+                continue
+            with on_shard(db, shard):
+                rows = db.execute(select(models.Task.id, models.Task.owner_id).where(models.Task.id.in_(ids))).all()
+            for task_id, owner_id in rows:
+                if owner_id is None or _assignment(db, owner_id)[0] == shard:
+                    cache[task_id] = (shard, owner_id)
+                    missing.discard(task_id)
+        if not missing:
+            break
+    return {task_id: cache[task_id] for task_id in task_ids if task_id in cache}
+
+def route_task(db, task_id: int, for_write: bool = False):
+    """Send db's task statements to the shard holding task_id; None when no shard has it"""
+    if not enabled():
+        return 0
+    location = locate(db, [task_id]).get(task_id)
+    if location is None:
+        return None
+    shard, owner_id = location
+    if for_write:
+        check_writable(db, [owner_id])
+    db.info["shard"] = shard
+    return shard
+
+def merge_sorted(pages, column: str = "id", descending: bool = False):
+    """Per-shard pages (ORM objects or dicts) as one list in page order: `column`, then ascending id"""
+    def value(name):
+        return lambda item: item[name] if isinstance(item, dict) else getattr(item, name)
+
+    items = [item for page in pages for item in page]
+    items.sort(key=value("id"), reverse=descending and column == "id")
+    if column != "id":
+        # Stable, so equal values stay in id order
+        items.sort(key=value(column), reverse=descending)
+    return items
+
+# Writes
+def assign_new_user(db, user: models.User):
+    """Put a new user on the shard with the fewest users; unmapped (pre-sharding) users count towards shard 0"""
+    if not enabled():
+        return
+    db.flush()
+    table = models.ShardAssignment
+    users = dict(db.execute(select(table.shard, func.count()).group_by(table.shard)).all())
+    unmapped = db.query(func.count(models.User.id)).scalar() - 1 - sum(users.values())
+    users[0] = users.get(0, 0) + max(0, unmapped)
+    shard = min(shards(), key=lambda shard: (users.get(shard, 0), shard))
+    db.add(table(owner_id=user.id, shard=shard, moving=False))
+
+def forget_user(db, user_id: int):
+    if enabled():
+        db.execute(delete(models.ShardAssignment).where(models.ShardAssignment.owner_id == user_id))
+        assignment_cache.pop(user_id)
+
+def allocate_ids(db, count: int):
+    """`count` new task ids from the routed shard's range (None when not sharded: the database assigns them)"""
+    if not enabled():
+        return None
+    shard = db.info.get("shard") or 0
+    table = models.TaskIdSequence.__table__
+    next_id = db.execute(
+        update(table).where(table.c.shard == shard).values(next_id=table.c.next_id + count).returning(table.c.next_id)
+    ).scalar()
+    if next_id is None:
+        raise RuntimeError(f"shard {shard} has no task id sequence; run `python -m backend.migrations upgrade`")
+    return range(next_id - count, next_id)
+
+def prepare():
+    """Start each shard's task id sequence above its existing ids; refuse a database set up as another shard"""
+    tasks, table = models.Task.__table__, models.TaskIdSequence.__table__
+    for shard, shard_engine in enumerate(database.shard_engines):
+        with shard_engine.begin() as conn:
+            existing = conn.execute(select(table.c.shard)).scalars().all()
+            if existing and existing != [shard]:
+                raise RuntimeError(f"{shard_engine.url} was set up as shard {existing[0]}, not shard {shard}")
+            if not existing:
+                in_range = tasks.c.id.between(shard * ID_RANGE, (shard + 1) * ID_RANGE - 1)
+                highest = conn.execute(select(func.max(tasks.c.id)).where(in_range)).scalar()
+                conn.execute(insert(table).values(shard=shard, next_id=max(shard * ID_RANGE, highest or 0) + 1))
+
+# Moving owners between shards
+def _upsert(conn, table, rows):
+    """Insert rows, overwriting the non-key columns of rows that already exist"""
+    if not rows:
+        return
+    keys = [column.name for column in table.primary_key]
+    stmt = importlib.import_module(f"sqlalchemy.dialects.{conn.dialect.name}").insert(table).values(rows)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=keys, set_={name: stmt.excluded[name] for name in rows[0] if name not in keys}
+    ))
+
+def _copy_tasks(source, target, owner_id: int, task_ids=None, batch_size: int = 5000):
+    """Copy the owner's task rows (only task_ids when given), deleted ones included"""
+    tasks = models.Task.__table__
+    stmt = select(tasks).where(tasks.c.owner_id == owner_id).order_by(tasks.c.id)
+    chunks = [None] if task_ids is None else [task_ids[i:i + batch_size] for i in range(0, len(task_ids), batch_size)]
+    for chunk in chunks:
+        chunk_stmt = stmt if chunk is None else stmt.where(tasks.c.id.in_(chunk))
+        with source.connect() as conn:
+            for rows in conn.execute(chunk_stmt.execution_options(yield_per=batch_size)).partitions():
+                with target.begin() as target_conn:
+                    _upsert(target_conn, tasks, [row._asdict() for row in rows])
+
+def _copy_revisions(source, target, owner_id: int, after: int, upto: int, batch_size: int = 5000):
+    """Append the owner's revisions with source ids in (after, upto]; returns the task ids they touched"""
+    revisions, tasks = models.TaskRevision.__table__, models.Task.__table__
+    columns = [column for column in revisions.c if column.name != "id"]
+    touched = set()
+    while after < upto:
+        with source.connect() as conn:
+            rows = conn.execute(
+                select(revisions.c.id, *columns)
+                .join(tasks, tasks.c.id == revisions.c.task_id)
+                .where(tasks.c.owner_id == owner_id, revisions.c.id > after, revisions.c.id <= upto)
+                .order_by(revisions.c.id).limit(batch_size)
+            ).all()
+        if not rows:
+            break
+        with target.begin() as conn:
+            conn.execute(insert(revisions), [{column.name: row._mapping[column.name] for column in columns} for row in rows])
+        touched.update(row.task_id for row in rows)
+        after = rows[-1].id
+    return touched
+
+def _last_revision_id(shard_engine) -> int:
+    with shard_engine.connect() as conn:
+        return conn.execute(select(func.max(models.TaskRevision.__table__.c.id))).scalar() or 0
+
+def _purge(shard_engine, owner_id: int, batch_size: int = 5000):
+    """Delete the owner's tasks, revisions and counters from a shard (list versions stay: their sum must only grow)"""
+    tasks, revisions = models.Task.__table__, models.TaskRevision.__table__
+    while True:
+        with shard_engine.begin() as conn:
+            ids = conn.execute(select(tasks.c.id).where(tasks.c.owner_id == owner_id).limit(batch_size)).scalars().all()
+            if not ids:
+                break
+            conn.execute(delete(revisions).where(revisions.c.task_id.in_(ids)))
+            conn.execute(delete(tasks).where(tasks.c.id.in_(ids)))
+    with shard_engine.begin() as conn:
+        for model in (models.TaskStatusCount, models.TaskDailyCount):
+            conn.execute(delete(model.__table__).where(model.__table__.c.owner_id == owner_id))
+
+def _finish_counters(source, target, owner_id: int):
+    """Rebuild the owner's counters on the target; its list version becomes target + source + 1.
+
+    The source keeps its version row, so the sum over the shards that admin
+    ETags use never goes back down.
+    """
+    tasks = models.Task.__table__
+    status_counts, daily_counts = models.TaskStatusCount.__table__, models.TaskDailyCount.__table__
+    versions = models.TaskVersion.__table__
+    with source.connect() as conn:
+        daily = conn.execute(select(daily_counts).where(daily_counts.c.owner_id == owner_id)).all()
+        source_version = conn.execute(select(versions.c.version).where(versions.c.owner_id == owner_id)).scalar()
+    with target.begin() as conn:
+        conn.execute(delete(status_counts).where(status_counts.c.owner_id == owner_id))
+        conn.execute(status_counts.insert().from_select(
+            ["owner_id", "status", "count"],
+            select(tasks.c.owner_id, cast(tasks.c.status, String), func.count())
+            .where(tasks.c.owner_id == owner_id, tasks.c.deleted_at.is_(None))
+            .group_by(tasks.c.owner_id, tasks.c.status),
+        ))
+        _upsert(conn, daily_counts, [row._asdict() for row in daily])
+        target_version = conn.execute(select(versions.c.version).where(versions.c.owner_id == owner_id)).scalar()
+        _upsert(conn, versions, [{"owner_id": owner_id, "version": (target_version or 0) + (source_version or 0) + 1}])
+
+def _set_assignment(owner_id: int, shard: int, moving: bool):
+    table = models.ShardAssignment.__table__
+    with database.engine.begin() as conn:
+        _upsert(conn, table, [{"owner_id": owner_id, "shard": shard, "moving": moving}])
+    assignment_cache.pop(owner_id)
+
+def current_shard(owner_id: int) -> int:
+    table = models.ShardAssignment.__table__
+    with database.engine.connect() as conn:
+        return conn.execute(select(table.c.shard).where(table.c.owner_id == owner_id)).scalar() or 0
+
+def move_user(owner_id: int, target_shard: int, drain: float = None, batch_size: int = 5000, log=print):
+    """Move an owner's task data to target_shard while the API keeps serving them"""
+    drain = config.SHARD_MOVE_DRAIN if drain is None else drain
+    if drain <= config.SHARD_MAP_CACHE_TTL:
+        raise ValueError(f"the drain ({drain}s) must be longer than TASKS_SHARD_MAP_CACHE_TTL ({config.SHARD_MAP_CACHE_TTL}s)")
+    source_shard = current_shard(owner_id)
+    if source_shard == target_shard:
+        log(f"user {owner_id} is already on shard {target_shard}")
+        return
+    source, target = database.shard_engines[source_shard], database.shard_engines[target_shard]
+    # Leftovers of an earlier, aborted move
+    _purge(target, owner_id, batch_size)
+    try:
+        # Bulk copy while writes go on; the revisions written meanwhile tell which rows to copy again
+        copied = _last_revision_id(source)
+        _copy_tasks(source, target, owner_id, batch_size=batch_size)
+        _copy_revisions(source, target, owner_id, 0, copied, batch_size)
+        for final in (False, True):
+            if final:
+                _set_assignment(owner_id, source_shard, moving=True)
+                # Let every process see the flag (cache TTL) and the writes routed before it finish
+                time.sleep(drain)
+            upto = _last_revision_id(source)
+            touched = _copy_revisions(source, target, owner_id, copied, upto, batch_size)
+            if touched:
+                _copy_tasks(source, target, owner_id, sorted(touched), batch_size)
+            copied = upto
+            log(f"user {owner_id}: caught up with {len(touched)} changed tasks" + (" (writes paused)" if final else ""))
+        _finish_counters(source, target, owner_id)
+    except BaseException:
+        _purge(target, owner_id, batch_size)
+        _set_assignment(owner_id, source_shard, moving=False)
+        raise
+    _set_assignment(owner_id, target_shard, moving=False)
+    # Reads may still go to the source until every process has seen the switch
+    time.sleep(config.SHARD_MAP_CACHE_TTL)
+    _purge(source, owner_id, batch_size)
+    log(f"user {owner_id}: moved from shard {source_shard} to shard {target_shard}")
+
+# Reporting and rebalancing
+def owner_loads():
+    """{shard: {owner_id: live tasks}} from the analytics counters"""
+    counts = models.TaskStatusCount.__table__
+    loads = {}
+    for shard, shard_engine in enumerate(database.shard_engines):
+        with shard_engine.connect() as conn:
+            rows = conn.execute(
+                select(counts.c.owner_id, func.sum(counts.c.count)).group_by(counts.c.owner_id)
+            ).all()
+        loads[shard] = {owner_id: total for owner_id, total in rows if total}
+    return loads
+
+def plan_rebalance(loads, max_moves: int = 10):
+    """Greedy moves [(owner_id, from, to, tasks)] from the fullest to the emptiest shard, each narrowing their gap"""
+    loads = {shard: dict(owners) for shard, owners in loads.items()}
+    moves = []
+    for _ in range(max_moves):
+        totals = {shard: sum(owners.values()) for shard, owners in loads.items()}
+        heavy, light = max(totals, key=totals.get), min(totals, key=totals.get)
+        gap = totals[heavy] - totals[light]
+        candidates = [(abs(gap / 2 - tasks), owner_id, tasks) for owner_id, tasks in loads[heavy].items() if tasks < gap]
+        if not candidates:
+            break
+        _, owner_id, tasks = min(candidates)
+        moves.append((owner_id, heavy, light, tasks))
+        loads[light][owner_id] = loads[heavy].pop(owner_id)
+    return moves
+
+def status():
+    users = dict.fromkeys(shards(), 0)
+    table = models.ShardAssignment.__table__
+    with database.engine.connect() as conn:
+        users.update(conn.execute(select(table.c.shard, func.count()).group_by(table.c.shard)).all())
+        users[0] += conn.execute(select(func.count(models.User.__table__.c.id))).scalar() - sum(users.values())
+    loads = owner_loads()
+    return [
+        {
+            "shard": shard, "url": shard_engine.url.render_as_string(hide_password=True),
+            "users": users.get(shard, 0), "live_tasks": sum(loads[shard].values()),
+        }
+        for shard, shard_engine in enumerate(database.shard_engines)
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and rebalance the task shards")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="users and live tasks per shard")
+    move = commands.add_parser("move", help="move one user's tasks to another shard")
+    move.add_argument("--user", type=int, required=True)
+    move.add_argument("--to", type=int, required=True)
+    rebalance = commands.add_parser("rebalance", help="move users from the fullest to the emptiest shards")
+    rebalance.add_argument("--max-moves", type=int, default=10)
+    rebalance.add_argument("--dry-run", action="store_true")
+    for command in (move, rebalance):
+        command.add_argument("--drain", type=float, default=None, help="seconds writes are paused before the switch")
+        command.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    if not enabled():
+        parser.exit(1, "task data is not sharded; set TASKS_SHARDS\n")
+    if args.command == "status":
+        print(json.dumps(status(), indent=2))
+    elif args.command == "move":
+        if args.to not in shards():
+            parser.exit(1, f"shard {args.to} does not exist (TASKS_SHARDS={config.SHARDS})\n")
+        move_user(args.user, args.to, args.drain, args.batch_size)
+    else:
+        for owner_id, source, target, tasks in plan_rebalance(owner_loads(), args.max_moves):
+            print(f"user {owner_id}: shard {source} -> {target} ({tasks} tasks)")
+            if not args.dry_run:
+                move_user(owner_id, target, args.drain, args.batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,17 @@
+import base64
+import binascii
+import csv
+import hashlib
+import io
+import json
+
 from fastapi import HTTPException, status
 
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
 def check_admin_privileges(user):
     """Check if user has admin role"""
     if user.role != "admin":
@@ -24,4 +36,56 @@ def format_task_response(task):
         "description": task.description,
         "status": task.status.value,
         "owner_id": task.owner_id
-    }
\ No newline at end of file
+    }
+
+def encode_cursor(last_id):
+    """Build an opaque pagination cursor from the last task id of a page"""
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Return the task id encoded in a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded.encode()).decode().partition(":")
+        if prefix != "id":
+            raise ValueError(cursor)
+        return int(value)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def make_etag(scope, version, url):
+    """Strong ETag for a read of `url` by `scope` ("all" or an owner id) at a task list version"""
+    digest = hashlib.sha1(f"{scope}|{url.path}?{url.query}".encode()).hexdigest()[:16]
+    return f'"{scope}-{version}-{digest}"'
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an ETag, as RFC 9110 requires for GET"""
+    if not if_none_match:
+        return False
+    return any(tag.strip()[2:] == etag if tag.strip().startswith("W/") else tag.strip() == etag
+               for tag in if_none_match.split(","))
+
+def dumps_json(content) -> bytes:
+    """Compact JSON bytes, via orjson when it is installed (str enums encode as their value)"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def _row_values(row):
+    return [value.value if hasattr(value, "value") else value for value in row]
+
+def encode_ndjson_rows(columns, rows):
+    """Encode row tuples as newline-delimited JSON objects"""
+    return "".join(json.dumps(dict(zip(columns, _row_values(row)))) + "\n" for row in rows)
+
+def encode_csv_rows(rows, columns=None):
+    """Encode row tuples as CSV lines, preceded by a header when columns is given"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if columns:
+        writer.writerow(columns)
+    writer.writerows(_row_values(row) for row in rows)
+    return buffer.getvalue()
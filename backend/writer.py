@@ -0,0 +1,157 @@
+"""Single-writer queue with group commit.
+
+SQLite allows one writer at a time, so concurrent write requests otherwise
+contend for the database lock and each pay for their own commit. When
+``TASKS_WRITE_QUEUE`` is enabled, routes hand their crud write functions to
+one writer thread instead. It drains whatever has queued up (up to
+``WRITE_QUEUE_MAX_BATCH`` jobs, waiting at most ``WRITE_QUEUE_MAX_WAIT_MS``
+for stragglers), runs each job in its own SAVEPOINT inside a single
+transaction and commits once for the whole batch. A failing job only rolls
+back its savepoint; callers are resolved after the batch commit is durable.
+"""
+import asyncio
+import contextvars
+import queue
+import threading
+from concurrent.futures import Future
+
+from sqlalchemy.orm import Session
+
+from . import config, events
+from .database import SQLALCHEMY_DATABASE_URL, create_db_engine, run_db
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "context", "future")
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.context = contextvars.copy_context()
+        self.future = Future()
+
+_STOP = object()
+
+class WriteQueue:
+    def __init__(self, bind, max_batch: int = 64, max_wait: float = 0.002):
+        self.bind = bind
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.jobs = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="task-db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Queue `fn(session, *args, **kwargs)`; the future resolves once its batch has committed"""
+        job = _Job(fn, args, kwargs)
+        self._ensure_started()
+        self._queue.put(job)
+        return job.future
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stop(self, timeout: float = 5.0):
+        """Flush queued jobs and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get(timeout=self.max_wait) if self.max_wait else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is _STOP:
+                # Finish this batch, then stop
+                self._queue.put(_STOP)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        results, pending_events = [], []
+        try:
+            with self.bind.connect() as conn:
+                transaction = conn.begin()
+                if conn.dialect.name == "sqlite":
+                    # Take the write lock up front; also keeps pysqlite from
+                    # committing when the first job's SAVEPOINT is released
+                    conn.exec_driver_sql("BEGIN IMMEDIATE")
+                for job in batch:
+                    if not job.future.set_running_or_notify_cancel():
+                        continue
+                    # Each job's session.commit() only releases its own SAVEPOINT,
+                    # so its change events are held back until the batch commit
+                    job_events = []
+                    session = Session(
+                        bind=conn, join_transaction_mode="create_savepoint",
+                        autoflush=False, expire_on_commit=False, info={"pending_events": job_events},
+                    )
+                    try:
+                        results.append((job, job.context.run(job.fn, session, *job.args, **job.kwargs), None))
+                        pending_events.extend(job_events)
+                    except Exception as exc:
+                        session.rollback()
+                        results.append((job, None, exc))
+                    finally:
+                        session.close()
+                transaction.commit()
+        except Exception as exc:
+            # Nothing in the batch was committed
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(exc)
+            return
+
+        self.batches += 1
+        self.jobs += len(results)
+        events.broker.publish(pending_events)
+        for job, result, error in results:
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+    def stats(self):
+        return {"pending": self._queue.qsize(), "batches": self.batches, "jobs": self.jobs}
+
+write_queue = None
+if config.WRITE_QUEUE:
+    # A dedicated engine so the writer never waits on a pool drained by the
+    # very requests that are waiting on it
+    write_queue = WriteQueue(
+        create_db_engine(SQLALCHEMY_DATABASE_URL), max_batch=config.WRITE_QUEUE_MAX_BATCH, max_wait=config.WRITE_QUEUE_MAX_WAIT_MS / 1000
+    )
+
+async def run_write(db, fn, *args, **kwargs):
+    """Like database.run_db, but routed through the group-commit writer when it is enabled"""
+    if write_queue is not None:
+        return await write_queue.run(fn, *args, **kwargs)
+    return await run_db(db, fn, *args, **kwargs)
+
+def shutdown():
+    if write_queue is not None:
+        write_queue.stop()
@@ -0,0 +1,115 @@
+"""Admin analytics: counter tables versus scanning tasks.
+
+Seeds a throwaway SQLite database with N tasks spread over U users and the
+'created' revision of each (spread over the last 30 days), builds the counter
+tables the way migration 6 does, then times ``crud.get_task_analytics``
+against the same report computed with GROUP BY scans over ``tasks`` and
+``task_revisions``. It also times the backfill itself and a single task
+create, which now adjusts the counters in its transaction.
+
+    python -m benchmarks.bench_analytics --tasks 1000000 --users 1000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from backend import crud, migrations, models, schemas
+
+STATUSES = [status.name for status in models.StatusEnum]
+
+SCAN_STATUS = """
+SELECT owner_id, status, count(*) FROM tasks
+WHERE deleted_at IS NULL GROUP BY owner_id, status
+"""
+SCAN_DAILY = """
+SELECT date(r.changed_at), count(*) FROM task_revisions r
+WHERE r.op = 'created' AND r.changed_at >= :since GROUP BY date(r.changed_at)
+"""
+
+def seed(path, n_users, n_tasks, batch=50_000):
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.upgrade(engine, target=5)
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.executemany(
+            "INSERT INTO users (username, hashed_password, role) VALUES (?, 'x', 'user')",
+            [(f"user{i}",) for i in range(1, n_users + 1)],
+        )
+        for start in range(0, n_tasks, batch):
+            ids = range(start + 1, min(start + batch, n_tasks) + 1)
+            statuses = [rng.choice(STATUSES) for _ in ids]
+            cursor.executemany(
+                "INSERT INTO tasks (id, title, description, status, owner_id) VALUES (?, ?, 'benchmark task', ?, ?)",
+                [(i, f"task {i}", status, rng.randint(1, n_users)) for i, status in zip(ids, statuses)],
+            )
+            cursor.executemany(
+                "INSERT INTO task_revisions (task_id, changed_at, op, changes) VALUES (?, ?, 'created', ?)",
+                [
+                    (i, now - timedelta(seconds=rng.randint(0, 30 * 86400)), json.dumps({"status": status}))
+                    for i, status in zip(ids, statuses)
+                ],
+            )
+        raw.commit()
+    finally:
+        raw.close()
+    return engine
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+def scan_report(db, days):
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    return db.execute(text(SCAN_STATUS)).all(), db.execute(text(SCAN_DAILY), {"since": since}).all()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = seed(os.path.join(tmp, "analytics.db"), args.users, args.tasks)
+        start = time.perf_counter()
+        migrations.upgrade(engine)
+        backfill_ms = round((time.perf_counter() - start) * 1000, 3)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            report = crud.get_task_analytics(db, days=args.days)
+            results = {
+                "tasks": args.tasks,
+                "users": args.users,
+                "counter_rows": db.execute(text("SELECT count(*) FROM task_status_counts")).scalar(),
+                "backfill_ms": backfill_ms,
+                "analytics_counters_ms": timed(lambda: crud.get_task_analytics(db, days=args.days), args.repeat),
+                "analytics_scan_ms": timed(lambda: scan_report(db, args.days), args.repeat),
+                "create_task_ms": timed(
+                    lambda: crud.create_task(db, schemas.TaskCreate(title="bench"), owner_id=1), args.repeat
+                ),
+                "totals": report.totals.dict(),
+            }
+        engine.dispose()
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
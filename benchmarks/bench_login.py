@@ -0,0 +1,98 @@
+"""Login throughput versus concurrent task reads.
+
+Drives the app in-process over ASGI with a login storm running alongside
+task readers, once with bcrypt on the request threadpool (workers=0) and once
+on the hashing process pool, and reports login throughput, 429 count and
+task read latency. Requires httpx.
+
+    python -m benchmarks.bench_login --duration 10 --logins 32 --readers 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 3)
+
+async def run_mode(app, hashing, workers, args):
+    hashing.configure(workers=workers, max_pending=args.max_pending)
+    logins = {"ok": 0, "throttled": 0}
+    read_ms = []
+    deadline = time.perf_counter() + args.duration
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=60) as client:
+        token = (await client.post("/token", data={"username": "reader", "password": "secret"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        async def login_loop():
+            while time.perf_counter() < deadline:
+                response = await client.post("/token", data={"username": "reader", "password": "secret"})
+                if response.status_code == 429:
+                    logins["throttled"] += 1
+                    await asyncio.sleep(0.05)
+                else:
+                    logins["ok"] += 1
+
+        async def read_loop():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await client.get("/tasks/", headers=headers)
+                read_ms.append((time.perf_counter() - start) * 1000)
+
+        await asyncio.gather(
+            *[login_loop() for _ in range(args.logins)], *[read_loop() for _ in range(args.readers)]
+        )
+    hashing.shutdown()
+
+    return {
+        "workers": workers,
+        "logins_per_s": round(logins["ok"] / args.duration, 2),
+        "logins_throttled": logins["throttled"],
+        "task_reads_per_s": round(len(read_ms) / args.duration, 2),
+        "task_read_p50_ms": percentile(read_ms, 50),
+        "task_read_p95_ms": percentile(read_ms, 95),
+        "task_read_mean_ms": round(statistics.mean(read_ms), 3) if read_ms else None,
+    }
+
+async def main_async(args):
+    from backend import hashing
+    from backend.main import app, lifespan
+
+    async with lifespan(app):
+        async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+            await client.post("/users/", json={"username": "reader", "password": "secret"})
+            token = (await client.post("/token", data={"username": "reader", "password": "secret"})).json()["access_token"]
+            for i in range(args.tasks):
+                await client.post("/tasks/", json={"title": f"task {i}"}, headers={"Authorization": f"Bearer {token}"})
+
+        results = [await run_mode(app, hashing, 0, args), await run_mode(app, hashing, args.workers, args)]
+    print(json.dumps(results, indent=2))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--logins", type=int, default=32, help="concurrent login clients")
+    parser.add_argument("--readers", type=int, default=8, help="concurrent task readers")
+    parser.add_argument("--tasks", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="hashing processes")
+    parser.add_argument("--max-pending", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before the backend modules are imported
+        os.environ["TASKS_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        # Measure the hashing pool's own back-pressure, not the login rate limit
+        os.environ.setdefault("TASKS_RATE_LIMIT", "0")
+        asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Task search latency: FTS5 index versus LIKE scans.
+
+Seeds a throwaway SQLite database with generated titles/descriptions, times
+the tasks_fts build (migration 4), then the median latency of
+``crud.search_tasks`` for common, rare, prefix and multi-word queries, both
+for one user and for an admin (all tasks), against the equivalent
+``LIKE '%term%'`` queries it replaces.
+
+    python -m benchmarks.bench_search --tasks 1000000 --users 100
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, or_
+from sqlalchemy.orm import sessionmaker
+
+from backend import crud, migrations, models
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "shi", "den", "par", "qua", "zel", "bor", "fin", "gra"]
+
+def vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+def seed(engine, n_users, n_tasks, rng, words, batch=50_000):
+    # Zipf-like word frequencies: a few very common words, a long tail of rare ones
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"username": f"user{i}", "hashed_password": "x", "role": "user"} for i in range(1, n_users + 1)
+        ])
+        for start in range(0, n_tasks, batch):
+            size = min(batch, n_tasks - start)
+            title_words = rng.choices(words, weights, k=size * 4)
+            description_words = rng.choices(words, weights, k=size * 12)
+            conn.execute(models.Task.__table__.insert(), [
+                {
+                    "title": " ".join(title_words[i * 4:i * 4 + 4]),
+                    "description": " ".join(description_words[i * 12:i * 12 + 12]),
+                    "status": "pending",
+                    "owner_id": rng.randint(1, n_users),
+                }
+                for i in range(size)
+            ])
+
+def like_search(db, q, owner_id=None, limit=50):
+    query = db.query(models.Task)
+    if owner_id is not None:
+        query = query.filter(models.Task.owner_id == owner_id)
+    for term in q.replace("*", "").split():
+        query = query.filter(or_(models.Task.title.contains(term), models.Task.description.contains(term)))
+    return query.order_by(models.Task.id).limit(limit).all()
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--words", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(42)
+    words = vocabulary(rng, args.words)
+    queries = {
+        "common_word": words[0],
+        "rare_word": words[-1],
+        "prefix": words[len(words) // 2][:4] + "*",
+        "two_words": f"{words[1]} {words[5]}",
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Session = sessionmaker(bind=engine)
+        migrations.upgrade(engine, target=3)
+        seed(engine, args.users, args.tasks, rng, words)
+        start = time.perf_counter()
+        migrations.upgrade(engine)
+        build_s = round(time.perf_counter() - start, 2)
+
+        results = {}
+        with Session() as db:
+            owner_id = args.users // 2 or 1
+            for name, q in queries.items():
+                results[name] = {
+                    "query": q,
+                    "matches": len(crud.search_tasks(db, q, limit=args.tasks)),
+                    "fts_user_ms": timed(lambda: crud.search_tasks(db, q, owner_id=owner_id), args.repeat),
+                    "fts_all_ms": timed(lambda: crud.search_tasks(db, q), args.repeat),
+                    "like_user_ms": timed(lambda: like_search(db, q, owner_id=owner_id), args.repeat),
+                    "like_all_ms": timed(lambda: like_search(db, q), args.repeat),
+                }
+        engine.dispose()
+
+    print(json.dumps({"tasks": args.tasks, "users": args.users, "index_build_s": build_s, "queries": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
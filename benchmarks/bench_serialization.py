@@ -0,0 +1,80 @@
+"""Per-page CPU cost of the task list response paths.
+
+Times, in CPU milliseconds per page, everything ``GET /tasks/`` does after the
+route is entered except the HTTP plumbing:
+
+  * orm  - load ORM objects, validate them through ``schemas.Task`` (orm_mode)
+           and render with ``jsonable_encoder`` + ``JSONResponse``, as FastAPI does
+  * fast - select the response columns as tuples and encode them directly
+           (``TASKS_FAST_JSON``), with orjson when installed
+
+and checks that both produce the same JSON.
+
+    python -m benchmarks.bench_serialization --page 100 --repeat 500
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import crud, metrics, migrations, models, schemas, utils
+
+def seed(engine, n_tasks):
+    migrations.upgrade(engine)
+    statuses = list(models.StatusEnum)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [{"username": "bench", "hashed_password": "x", "role": "user"}])
+        conn.execute(models.Task.__table__.insert(), [
+            {"title": f"task {i}", "description": "benchmark task " * 4, "status": statuses[i % 3], "owner_id": 1}
+            for i in range(n_tasks)
+        ])
+
+def orm_page(db, limit):
+    tasks = crud.get_user_tasks(db, owner_id=1, limit=limit)
+    return JSONResponse(jsonable_encoder(parse_obj_as(List[schemas.Task], tasks))).body
+
+def fast_page(db, limit):
+    return metrics.FastJSONResponse(crud.get_task_rows(db, owner_id=1, limit=limit)).body
+
+def cpu_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        samples.append((time.process_time() - start) * 1000)
+    return {"median_ms": round(statistics.median(samples), 4), "mean_ms": round(statistics.fmean(samples), 4)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Session = sessionmaker(bind=engine, autoflush=False)
+        seed(engine, args.page)
+        with Session() as db:
+            assert json.loads(orm_page(db, args.page)) == json.loads(fast_page(db, args.page))
+            # A fresh identity map per page, like one request per page
+            results = {
+                name: cpu_ms(lambda: (page(db, args.page), db.expunge_all()), args.repeat)
+                for name, page in (("orm", orm_page), ("fast", fast_page))
+            }
+        engine.dispose()
+
+    results["speedup"] = round(results["orm"]["median_ms"] / results["fast"]["median_ms"], 2)
+    results.update(page=args.page, encoder="orjson" if utils.orjson is not None else "json")
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
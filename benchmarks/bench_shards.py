@@ -0,0 +1,87 @@
+"""Write throughput with task data in one SQLite file versus N shards.
+
+For each shard count, a fresh interpreter (the shard count is read at import)
+sets up throwaway databases with U users, then P forked worker processes
+create tasks through ``crud.create_task`` for random users for D seconds, each
+create in its own transaction. Reports creates per second and the p50/p95/p99 create latency;
+with one file every create waits for the single write lock, with N shards
+only creates that land on the same shard do.
+
+    python -m benchmarks.bench_shards --shards 1 2 4 --processes 8 --seconds 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = """
+import json, multiprocessing, random, sys, time
+from backend import crud, database, migrations, schemas
+
+users, processes, seconds = int(sys.argv[1]), int(sys.argv[2]), float(sys.argv[3])
+migrations.upgrade_all()
+with database.SessionLocal() as db:
+    owner_ids = [
+        crud.create_user(db, schemas.UserCreate(username=f"user{i}", password="x"), hashed_password="x").id
+        for i in range(users)
+    ]
+for shard_engine in database.shard_engines:
+    shard_engine.dispose()
+
+def work(seed, deadline, results):
+    rng, task = random.Random(seed), schemas.TaskCreate(title="bench", description="shard benchmark task")
+    latencies = []
+    while time.time() < deadline:
+        with database.SessionLocal() as db:
+            start = time.perf_counter()
+            crud.create_task(db, task, owner_id=rng.choice(owner_ids))
+            latencies.append(time.perf_counter() - start)
+    results.put(latencies)
+
+context = multiprocessing.get_context("fork")
+results, deadline = context.Queue(), time.time() + 1 + seconds
+workers = [context.Process(target=work, args=(seed, deadline, results)) for seed in range(processes)]
+for worker in workers:
+    worker.start()
+latencies = sorted(latency for _ in workers for latency in results.get())
+for worker in workers:
+    worker.join()
+def pct(p):
+    return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 3)
+print(json.dumps({
+    "creates": len(latencies), "creates_per_s": round(len(latencies) / seconds, 1),
+    "p50_ms": pct(0.5), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+}))
+"""
+
+def run(shards, args, tmp):
+    directory = os.path.join(tmp, f"shards{shards}")
+    os.makedirs(directory)
+    env = dict(
+        os.environ,
+        TASKS_DATABASE_URL=f"sqlite:///{os.path.join(directory, 'main.db')}",
+        TASKS_SHARDS=str(shards),
+        TASKS_SHARD_URL_TEMPLATE=f"sqlite:///{os.path.join(directory, 'shard{shard}.db')}",
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, str(args.users), str(args.processes), str(args.seconds)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {f"{shards}_shards": run(shards, args, tmp) for shards in args.shards}
+    print(json.dumps({"users": args.users, "processes": args.processes, **results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Mixed read/write throughput per SQLite engine profile.
+
+Runs the same in-process ASGI workload (concurrent task readers and task
+writers against one user) under each configuration, each in a fresh
+interpreter so the engine is built from that configuration:
+
+  * default    - SQLite's own journal/sync settings
+  * production - WAL, synchronous=NORMAL, mmap, busy timeout
+  * production+queue - the above plus the group-commit write queue
+
+    python -m benchmarks.bench_sqlite_profile --duration 10 --readers 16 --writers 16
+
+Requires httpx.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+CONFIGURATIONS = [
+    ("default", {"TASKS_SQLITE_PROFILE": "default", "TASKS_WRITE_QUEUE": "0"}),
+    ("production", {"TASKS_SQLITE_PROFILE": "production", "TASKS_WRITE_QUEUE": "0"}),
+    ("production+queue", {"TASKS_SQLITE_PROFILE": "production", "TASKS_WRITE_QUEUE": "1"}),
+]
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 3)
+
+async def workload(args):
+    from backend.main import app, lifespan
+
+    reads, writes, errors = [], [], 0
+    async with lifespan(app), httpx.AsyncClient(app=app, base_url="http://bench", timeout=120) as client:
+        await client.post("/users/", json={"username": "bench", "password": "secret"})
+        token = (await client.post("/token", data={"username": "bench", "password": "secret"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        await client.post("/tasks/bulk", json=[{"title": f"seed {i}"} for i in range(1000)], headers=headers)
+        deadline = time.perf_counter() + args.duration
+
+        async def loop(samples, call):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await call()
+                    ok = response.status_code < 400
+                except Exception:
+                    ok = False
+                if ok:
+                    samples.append((time.perf_counter() - start) * 1000)
+                else:
+                    errors += 1
+
+        read = lambda: client.get("/tasks/", params={"limit": 50}, headers=headers)
+        write = lambda: client.post("/tasks/", json={"title": "bench write"}, headers=headers)
+        await asyncio.gather(
+            *[loop(reads, read) for _ in range(args.readers)], *[loop(writes, write) for _ in range(args.writers)]
+        )
+
+    return {
+        "reads_per_s": round(len(reads) / args.duration, 1),
+        "writes_per_s": round(len(writes) / args.duration, 1),
+        "read_p95_ms": percentile(reads, 95),
+        "write_p95_ms": percentile(writes, 95),
+        "errors": errors,
+    }
+
+def run_child(args):
+    print(json.dumps(asyncio.run(workload(args))))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args)
+        return
+
+    results = {}
+    for name, env in CONFIGURATIONS:
+        with tempfile.TemporaryDirectory() as tmp:
+            child_env = dict(
+                os.environ, **env,
+                TASKS_DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                TASKS_BCRYPT_ROUNDS="4",
+                TASKS_RATE_LIMIT="0",
+            )
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_sqlite_profile", "--child",
+                 "--duration", str(args.duration), "--readers", str(args.readers), "--writers", str(args.writers)],
+                env=child_env, capture_output=True, text=True, check=True,
+            ).stdout
+            results[name] = json.loads(output.strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
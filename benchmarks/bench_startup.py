@@ -0,0 +1,125 @@
+"""Startup cost: import time of backend.main and the app's lifespan startup.
+
+Each sample runs in a fresh interpreter with ``-X importtime`` against a
+throwaway SQLite database and records the time to import ``backend.main``,
+the import time of every backend module and of the heaviest third-party
+packages, which optional-at-import modules got loaded anyway, and how long
+the lifespan startup (migrations of a fresh database) and the first
+``/health`` request take. The report is tagged with the git commit, so saved
+reports track startup cost per commit; ``--budget-ms`` fails the run when the
+median import time exceeds it.
+
+    python -m benchmarks.bench_startup --repeat 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Modules that backend.main should only import when they are first needed
+LAZY_MODULES = ["jose", "passlib", "cryptography", "redis", "aiosqlite", "sqlalchemy.ext.asyncio"]
+MARKER = "-- backend.main"
+
+CHILD = """
+import json, sys, time
+sys.stderr.write("%s\\n")
+start = time.perf_counter()
+import backend.main
+imported = time.perf_counter()
+sys.stderr.write("%s\\n")
+loaded = [name for name in %r if name in sys.modules]
+from fastapi.testclient import TestClient
+client = TestClient(backend.main.app)
+client.__enter__()
+started = time.perf_counter()
+status = client.get("/health").status_code
+first = time.perf_counter()
+client.__exit__(None, None, None)
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "lifespan_startup_ms": (started - imported) * 1000,
+    "first_request_ms": (first - started) * 1000,
+    "health_status": status,
+    "loaded": loaded,
+}))
+""" % (MARKER, MARKER, LAZY_MODULES)
+
+def parse_importtime(stderr):
+    """{module: cumulative microseconds} of the imports between the two markers"""
+    modules = {}
+    _, section, _ = stderr.split(MARKER + "\n", 2)
+    for line in section.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+def sample(tmp, index):
+    env = dict(os.environ, TASKS_DATABASE_URL=f"sqlite:///{os.path.join(tmp, f'startup{index}.db')}")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD], env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+def median(values):
+    return round(statistics.median(values), 3)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="third-party packages to list")
+    parser.add_argument("--output", default=None, help="also write the report to this file")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail when the median import exceeds this")
+    args = parser.parse_args(argv)
+
+    samples, importtimes = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for index in range(args.repeat):
+            timings, modules = sample(tmp, index)
+            samples.append(timings)
+            importtimes.append(modules)
+
+    def module_ms(name):
+        return median([modules.get(name, 0) / 1000 for modules in importtimes])
+
+    names = set().union(*importtimes)
+    backend = {name: module_ms(name) for name in sorted(names) if name.startswith("backend.")}
+    # A top-level package's first import line covers everything it pulled in
+    packages = {name for name in names if "." not in name and name != "backend"}
+    heaviest = sorted(((module_ms(name), name) for name in packages), reverse=True)[:args.top]
+
+    report = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "import_ms": median([s["import_ms"] for s in samples]),
+        "lifespan_startup_ms": median([s["lifespan_startup_ms"] for s in samples]),
+        "first_request_ms": median([s["first_request_ms"] for s in samples]),
+        "health_status": samples[-1]["health_status"],
+        "lazy_modules_loaded": samples[-1]["loaded"],
+        "backend_modules_ms": backend,
+        "heaviest_packages_ms": {name: ms for ms, name in heaviest},
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if args.budget_ms is not None and report["import_ms"] > args.budget_ms:
+        sys.exit(f"import of backend.main took {report['import_ms']} ms, budget {args.budget_ms} ms")
+
+if __name__ == "__main__":
+    main()
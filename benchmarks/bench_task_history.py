@@ -0,0 +1,175 @@
+"""Soft delete and task history: hot listing latency and revision storage.
+
+Seeds a throwaway SQLite database with N tasks and their revision log (one
+'created' revision per task plus some updates), deletes a fraction of the
+tasks and times the per-user listing queries from ``crud`` three ways:
+
+* ``hard_delete``: deleted rows are gone (the behaviour before soft delete)
+* ``soft_delete``: deleted rows stay, the listing indexes are partial (``WHERE deleted_at IS NULL``)
+* ``soft_delete_full_indexes``: deleted rows stay, the listing indexes cover them too
+
+It also times history and ``as_of`` reads and a single-task update, and
+reports how large the stored diffs are compared with full-row snapshots.
+
+    python -m benchmarks.bench_task_history --tasks 1000000 --users 100 --deleted 0.3
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from backend import crud, migrations, models, schemas
+
+STATUSES = [status.name for status in models.StatusEnum]
+
+def seed(path, n_users, n_tasks, updates, batch=50_000):
+    """Tasks created a day ago, then `updates` random status changes, logged as revisions"""
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.upgrade(engine)
+    rng = random.Random(42)
+    created_at = datetime.utcnow() - timedelta(days=1)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.executemany(
+            "INSERT INTO users (username, hashed_password, role) VALUES (?, 'x', 'user')",
+            [(f"user{i}",) for i in range(1, n_users + 1)],
+        )
+        for start in range(0, n_tasks, batch):
+            tasks = [
+                (f"task {i}", "benchmark task with a longer description", "pending", rng.randint(1, n_users))
+                for i in range(start, min(start + batch, n_tasks))
+            ]
+            cursor.executemany("INSERT INTO tasks (title, description, status, owner_id) VALUES (?, ?, ?, ?)", tasks)
+            cursor.executemany(
+                "INSERT INTO task_revisions (task_id, changed_at, op, changes) VALUES (?, ?, 'created', ?)",
+                [
+                    (i + 1, created_at, json.dumps(dict(zip(("title", "description", "status"), task[:3]))))
+                    for i, task in zip(range(start, start + len(tasks)), tasks)
+                ],
+            )
+        changes = [(rng.randint(1, n_tasks), rng.choice(STATUSES)) for _ in range(updates)]
+        cursor.executemany("UPDATE tasks SET status = ? WHERE id = ?", [(status, task_id) for task_id, status in changes])
+        cursor.executemany(
+            "INSERT INTO task_revisions (task_id, changed_at, op, changes) VALUES (?, ?, 'updated', ?)",
+            [
+                (task_id, created_at + timedelta(seconds=i), json.dumps({"status": status}, separators=(",", ":")))
+                for i, (task_id, status) in enumerate(changes)
+            ],
+        )
+        raw.commit()
+    finally:
+        raw.close()
+    engine.dispose()
+
+def delete_fraction(engine, fraction, soft):
+    step = max(1, round(1 / fraction)) if fraction > 0 else 0
+    if not step:
+        return
+    with engine.begin() as conn:
+        if soft:
+            now = datetime.utcnow()
+            conn.execute(text(f"UPDATE tasks SET deleted_at = :now WHERE id % {step} = 0"), {"now": now})
+            conn.execute(text(
+                f"INSERT INTO task_revisions (task_id, changed_at, op, changes) "
+                f"SELECT id, :now, 'deleted', '{{}}' FROM tasks WHERE id % {step} = 0"
+            ), {"now": now})
+        else:
+            conn.execute(text(f"DELETE FROM tasks WHERE id % {step} = 0"))
+
+def use_full_indexes(engine):
+    with engine.begin() as conn:
+        for index in models.Task.__table__.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        for name, columns in migrations._FULL_LISTING_INDEXES.items():
+            conn.execute(text(f"CREATE INDEX {name} ON tasks ({columns})"))
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+def run_queries(Session, n_users, repeat):
+    owner_id = n_users // 2 or 1
+    done = schemas.TaskFilter(status=[schemas.StatusEnum.done])
+    with Session() as db:
+        ids = db.execute(
+            text("SELECT id FROM tasks WHERE owner_id = :o AND deleted_at IS NULL ORDER BY id"), {"o": owner_id}
+        ).scalars().all()
+        middle = ids[len(ids) // 2] if ids else 0
+        return {
+            "user_first_page_ms": timed(lambda: crud.get_user_tasks(db, owner_id, limit=100), repeat),
+            "user_deep_keyset_page_ms": timed(
+                lambda: crud.get_user_tasks(db, owner_id, limit=100, after_id=middle), repeat
+            ),
+            "user_status_page_ms": timed(lambda: crud.get_user_tasks(db, owner_id, limit=100, filters=done), repeat),
+            "user_stats_ms": timed(lambda: crud.get_task_stats(db, owner_id), repeat),
+        }
+
+def run_history_queries(Session, n_users, repeat):
+    owner_id = n_users // 2 or 1
+    an_hour_ago = datetime.utcnow() - timedelta(hours=1)
+    with Session() as db:
+        task_id = db.execute(
+            text("SELECT id FROM tasks WHERE owner_id = :o AND deleted_at IS NULL ORDER BY id LIMIT 1"), {"o": owner_id}
+        ).scalar()
+        update = schemas.TaskUpdate(title="renamed", description="benchmark task with a longer description")
+        results = {
+            "history_ms": timed(lambda: crud.get_task_history(db, task_id), repeat),
+            "task_as_of_ms": timed(lambda: crud.get_task_as_of(db, task_id, owner_id, an_hour_ago), repeat),
+            "user_page_as_of_ms": timed(lambda: crud.get_tasks_as_of(db, an_hour_ago, owner_id, limit=100), repeat),
+            "update_task_ms": timed(lambda: crud.update_task(db, task_id, update), repeat),
+        }
+        row = db.execute(text(
+            "SELECT count(*), avg(length(changes)) FROM task_revisions"
+        )).first()
+        full_row = db.execute(text(
+            "SELECT avg(length(json_object('title', title, 'description', description, 'status', status))) FROM tasks"
+        )).scalar()
+        results.update(revisions=row[0], avg_diff_bytes=round(row[1], 1), avg_full_row_bytes=round(full_row, 1))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--updates", type=int, default=None, help="status changes to log (default: tasks / 2)")
+    parser.add_argument("--deleted", type=float, default=0.3, help="fraction of tasks deleted")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+    updates = args.tasks // 2 if args.updates is None else args.updates
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded = os.path.join(tmp, "seed.db")
+        seed(seeded, args.users, args.tasks, updates)
+        for variant in ("hard_delete", "soft_delete", "soft_delete_full_indexes"):
+            path = os.path.join(tmp, f"{variant}.db")
+            shutil.copy(seeded, path)
+            engine = create_engine(f"sqlite:///{path}")
+            delete_fraction(engine, args.deleted, soft=variant != "hard_delete")
+            if variant == "soft_delete_full_indexes":
+                use_full_indexes(engine)
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE"))
+            Session = sessionmaker(bind=engine)
+            results[variant] = run_queries(Session, args.users, args.repeat)
+            if variant == "soft_delete":
+                results["history"] = run_history_queries(Session, args.users, args.repeat)
+            engine.dispose()
+
+    print(json.dumps({"tasks": args.tasks, "users": args.users, "deleted": args.deleted, **results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Task listing latency with and without the listing indexes.
+
+Seeds a throwaway SQLite database, times the per-user listing queries from
+``crud`` against the bare schema, applies the index migration and times them
+again.
+
+    python -m benchmarks.bench_task_list --tasks 1000000 --users 100
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from backend import crud, migrations, models
+
+STATUSES = [status.name for status in models.StatusEnum]
+
+def seed(engine, n_users, n_tasks, batch=50_000):
+    migrations.upgrade(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            models.User.__table__.insert(),
+            [{"username": f"user{i}", "hashed_password": "x", "role": "user"} for i in range(1, n_users + 1)],
+        )
+    rng = random.Random(42)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for start in range(0, n_tasks, batch):
+            rows = [
+                (f"task {i}", "benchmark task", rng.choice(STATUSES), rng.randint(1, n_users))
+                for i in range(start, min(start + batch, n_tasks))
+            ]
+            cursor.executemany(
+                "INSERT INTO tasks (title, description, status, owner_id) VALUES (?, ?, ?, ?)", rows
+            )
+        raw.commit()
+    finally:
+        raw.close()
+
+def drop_listing_indexes(engine):
+    with engine.begin() as conn:
+        for table in (models.User.__table__, models.Task.__table__):
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+def run_queries(Session, n_users, n_tasks, repeat):
+    owner_id = n_users // 2 or 1
+    per_user = n_tasks // n_users
+    deep_skip = max(per_user - 100, 0)
+    with Session() as db:
+        last_id = db.execute(
+            text("SELECT id FROM tasks WHERE owner_id = :o ORDER BY id LIMIT 1 OFFSET :s"),
+            {"o": owner_id, "s": deep_skip},
+        ).scalar() or 0
+        return {
+            "user_first_page_ms": timed(lambda: crud.get_user_tasks(db, owner_id, limit=100), repeat),
+            "user_deep_offset_page_ms": timed(
+                lambda: crud.get_user_tasks(db, owner_id, skip=deep_skip, limit=100), repeat
+            ),
+            "user_deep_keyset_page_ms": timed(
+                lambda: crud.get_user_tasks(db, owner_id, limit=100, after_id=last_id), repeat
+            ),
+            "user_status_page_ms": timed(
+                lambda: db.query(models.Task)
+                .filter(
+                    models.Task.owner_id == owner_id, models.Task.status == models.StatusEnum.done,
+                    models.Task.deleted_at.is_(None),
+                )
+                .order_by(models.Task.id)
+                .limit(100)
+                .all(),
+                repeat,
+            ),
+            "login_lookup_ms": timed(lambda: crud.get_user_by_username(db, f"user{owner_id}"), repeat),
+        }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Session = sessionmaker(bind=engine)
+        seed(engine, args.users, args.tasks)
+
+        drop_listing_indexes(engine)
+        before = run_queries(Session, args.users, args.tasks, args.repeat)
+        with engine.begin() as conn:
+            for table in (models.User.__table__, models.Task.__table__):
+                for index in table.indexes:
+                    index.create(conn)
+            conn.execute(text("ANALYZE"))
+        after = run_queries(Session, args.users, args.tasks, args.repeat)
+        engine.dispose()
+
+    print(json.dumps({"tasks": args.tasks, "users": args.users, "before": before, "after": after}, indent=2))
+
+if __name__ == "__main__":
+    main()
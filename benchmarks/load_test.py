@@ -0,0 +1,325 @@
+"""Scripted load test of the API with machine-readable results.
+
+Seeds a throwaway SQLite database with N users and M tasks, then runs
+concurrent virtual users through a weighted mix of login, list, get, create,
+update and delete requests, either in-process over ASGI or against real
+uvicorn workers. Per endpoint it reports p50/p95/p99 latency, throughput,
+errors and SQL queries per request (read from the Server-Timing header, so
+it is exact under concurrency and across workers). Requires httpx.
+
+    python -m benchmarks.load_test --users 50 --tasks 50000 --mix read-heavy --duration 30 --output before.json
+    python -m benchmarks.load_test --target uvicorn --workers 4 --concurrency 64 --output after.json
+    python -m benchmarks.load_test compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+# Relative operation weights per scripted mix
+MIXES = {
+    "read-heavy": {"login": 1, "list": 60, "get": 25, "create": 6, "update": 6, "delete": 2},
+    "balanced": {"login": 2, "list": 35, "get": 18, "create": 15, "update": 20, "delete": 10},
+    "write-heavy": {"login": 1, "list": 14, "get": 10, "create": 30, "update": 30, "delete": 15},
+    "login": {"login": 1},
+}
+
+# Endpoint labels, as the routes are declared in backend/main.py
+ENDPOINTS = {
+    "login": "POST /token",
+    "list": "GET /tasks/",
+    "get": "GET /tasks/{task_id}",
+    "create": "POST /tasks/",
+    "update": "PUT /tasks/{task_id}",
+    "delete": "DELETE /tasks/{task_id}",
+}
+
+PASSWORD = "bench-secret"
+DB_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 3)
+
+def seed(database_url, n_users, n_tasks):
+    """Create the schema, N users sharing one password hash and M tasks spread round-robin"""
+    from sqlalchemy import create_engine, select
+    from backend import hashing, migrations, models
+
+    engine = create_engine(database_url)
+    migrations.upgrade(engine)
+    hashed = hashing.context().hash(PASSWORD)
+    statuses = list(models.StatusEnum)
+    with engine.begin() as conn:
+        conn.execute(models.User.__table__.insert(), [
+            {"username": f"bench{i}", "hashed_password": hashed, "role": "user"} for i in range(n_users)
+        ])
+        for start in range(0, n_tasks, 50_000):
+            conn.execute(models.Task.__table__.insert(), [
+                {"title": f"task {i}", "description": "load test task", "status": statuses[i % 3],
+                 "owner_id": i % n_users + 1}
+                for i in range(start, min(start + 50_000, n_tasks))
+            ])
+        owned = {}
+        for task_id, owner_id in conn.execute(select(models.Task.id, models.Task.owner_id)):
+            owned.setdefault(owner_id, []).append(task_id)
+    engine.dispose()
+    return owned
+
+class Recorder:
+    def __init__(self):
+        self.samples = {label: [] for label in ENDPOINTS.values()}
+        self.queries = {label: [] for label in ENDPOINTS.values()}
+        self.errors = {label: 0 for label in ENDPOINTS.values()}
+        self.recording = False
+
+    def record(self, label, elapsed_ms, response):
+        if not self.recording:
+            return
+        if response is None or response.status_code >= 400:
+            self.errors[label] += 1
+            return
+        self.samples[label].append(elapsed_ms)
+        match = DB_QUERIES.search(response.headers.get("server-timing", ""))
+        if match:
+            self.queries[label].append(int(match.group(1)))
+
+    def report(self, duration):
+        endpoints = {}
+        for label, samples in self.samples.items():
+            if not samples and not self.errors[label]:
+                continue
+            queries = self.queries[label]
+            endpoints[label] = {
+                "requests": len(samples),
+                "errors": self.errors[label],
+                "throughput_rps": round(len(samples) / duration, 1),
+                "p50_ms": percentile(samples, 50),
+                "p95_ms": percentile(samples, 95),
+                "p99_ms": percentile(samples, 99),
+                "db_queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+            }
+        everything = [sample for samples in self.samples.values() for sample in samples]
+        total = {
+            "requests": len(everything),
+            "errors": sum(self.errors.values()),
+            "throughput_rps": round(len(everything) / duration, 1),
+            "p50_ms": percentile(everything, 50),
+            "p95_ms": percentile(everything, 95),
+            "p99_ms": percentile(everything, 99),
+        }
+        return endpoints, total
+
+class VirtualUser:
+    def __init__(self, client, username, task_ids, rng, recorder):
+        self.client = client
+        self.username = username
+        self.task_ids = task_ids
+        self.rng = rng
+        self.recorder = recorder
+        self.headers = {}
+
+    async def call(self, op, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        self.recorder.record(ENDPOINTS[op], (time.perf_counter() - start) * 1000, response)
+        return response
+
+    async def login(self):
+        response = await self.call("login", "POST", "/token", data={"username": self.username, "password": PASSWORD})
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def list(self):
+        await self.call("list", "GET", "/tasks/", params={"limit": 50}, headers=self.headers)
+
+    async def get(self):
+        if self.task_ids:
+            await self.call("get", "GET", f"/tasks/{self.rng.choice(self.task_ids)}", headers=self.headers)
+
+    async def create(self):
+        response = await self.call("create", "POST", "/tasks/", json={"title": "load test"}, headers=self.headers)
+        if response is not None and response.status_code == 200:
+            self.task_ids.append(response.json()["id"])
+
+    async def update(self):
+        if self.task_ids:
+            body = {"title": "updated", "status": self.rng.choice(["pending", "in_progress", "done"])}
+            await self.call("update", "PUT", f"/tasks/{self.rng.choice(self.task_ids)}", json=body, headers=self.headers)
+
+    async def delete(self):
+        if self.task_ids:
+            task_id = self.task_ids.pop(self.rng.randrange(len(self.task_ids)))
+            await self.call("delete", "DELETE", f"/tasks/{task_id}", headers=self.headers)
+
+async def drive(client, owned, args, recorder):
+    weights = MIXES[args.mix]
+    ops, op_weights = list(weights), list(weights.values())
+    # Virtual users sharing a bench user get disjoint slices of its tasks, so deletes never collide
+    sharing = {}
+    for index in range(args.concurrency):
+        sharing.setdefault(index % args.users, []).append(index)
+    vus = []
+    for index in range(args.concurrency):
+        user = index % args.users
+        peers = sharing[user]
+        task_ids = owned.get(user + 1, [])[peers.index(index)::len(peers)]
+        vus.append(VirtualUser(client, f"bench{user}", task_ids, random.Random(args.seed + index), recorder))
+    await asyncio.gather(*(vu.login() for vu in vus))
+
+    async def run(vu, deadline):
+        while time.perf_counter() < deadline:
+            op = vu.rng.choices(ops, weights=op_weights)[0]
+            await getattr(vu, op)()
+
+    if args.warmup:
+        await asyncio.gather(*(run(vu, time.perf_counter() + args.warmup) for vu in vus))
+    recorder.recording = True
+    start = time.perf_counter()
+    await asyncio.gather(*(run(vu, start + args.duration) for vu in vus))
+    return time.perf_counter() - start
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def _wait_ready(base_url, process, timeout=60):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not become ready")
+
+async def run_target(owned, args, recorder):
+    if args.target == "asgi":
+        from backend.main import app, lifespan
+
+        async with lifespan(app), httpx.AsyncClient(app=app, base_url="http://bench", timeout=args.timeout) as client:
+            return await drive(client, owned, args, recorder)
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--workers", str(args.workers),
+         "--log-level", "warning", "--no-access-log"],
+        env=os.environ.copy(),
+    )
+    try:
+        await _wait_ready(base_url, process)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            return await drive(client, owned, args, recorder)
+    finally:
+        process.terminate()
+        process.wait(30)
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before the backend modules are imported (here and in uvicorn workers)
+        os.environ["TASKS_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        os.environ["TASKS_SERVER_TIMING"] = "1"
+        # Virtual users deliberately exceed per-user limits; opt back in with TASKS_RATE_LIMIT=1
+        os.environ.setdefault("TASKS_RATE_LIMIT", "0")
+        owned = seed(os.environ["TASKS_DATABASE_URL"], args.users, args.tasks)
+        recorder = Recorder()
+        duration = asyncio.run(run_target(owned, args, recorder))
+
+    endpoints, total = recorder.report(duration)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "target": args.target,
+            "workers": args.workers if args.target == "uvicorn" else None,
+            "mix": args.mix,
+            "users": args.users,
+            "tasks": args.tasks,
+            "concurrency": args.concurrency,
+            "duration_s": round(duration, 2),
+            "python": platform.python_version(),
+            "settings": {key: value for key, value in sorted(os.environ.items()) if key.startswith("TASKS_")},
+        },
+        "endpoints": endpoints,
+        "total": total,
+    }
+
+def compare(before_path, after_path):
+    """Print per-endpoint p95 and throughput changes between two result files"""
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    rows = []
+    for label in sorted(set(before["endpoints"]) | set(after["endpoints"]) | {"total"}):
+        old = before["total"] if label == "total" else before["endpoints"].get(label)
+        new = after["total"] if label == "total" else after["endpoints"].get(label)
+        if not old or not new:
+            continue
+        change = {}
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            if old.get(key) and new.get(key) is not None:
+                change[key] = {"before": old[key], "after": new[key], "change_pct": round((new[key] / old[key] - 1) * 100, 1)}
+        rows.append({"endpoint": label, **change})
+    print(json.dumps({"before": before["meta"].get("commit"), "after": after["meta"].get("commit"), "endpoints": rows}, indent=2))
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["compare"]:
+        parser = argparse.ArgumentParser(prog="load_test compare", description=compare.__doc__)
+        parser.add_argument("before")
+        parser.add_argument("after")
+        args = parser.parse_args(argv[1:])
+        compare(args.before, args.after)
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn worker processes")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="read-heavy")
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual users")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(report + "\n")
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""HTTP client for the Task Manager API, used by the Streamlit frontend.
+
+All calls go through one pooled ``requests.Session``, so connections are kept
+alive across Streamlit reruns instead of being opened per call. Every call has
+a timeout, and idempotent ones (GET/PUT/DELETE) are retried with backoff on
+connection errors and 502/503/504.
+
+Task lists are cached per status filter and loaded lazily, one keyset page at
+a time, as the UI pages through them. Creates, updates and deletes patch the
+cached lists from their responses rather than refetching them; a cached list
+older than ``max_age`` seconds is revalidated with ``If-None-Match``, which
+costs a single 304 when nothing changed elsewhere.
+"""
+import time
+from bisect import bisect_left
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) timeouts in seconds
+TIMEOUT = (3.05, 15)
+PAGE_SIZE = 200
+
+class ApiError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def _detail(response):
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    if isinstance(body, dict) and "detail" in body:
+        return str(body["detail"])
+    return response.reason or f"HTTP {response.status_code}"
+
+class TaskList:
+    """The tasks matching one status filter, in id order, as far as they have been loaded"""
+
+    def __init__(self, status=None):
+        self.status = status
+        self.tasks = []
+        self._ids = []
+        self.etag = None
+        self.next_cursor = None
+        self.complete = False
+        self.fetched_at = 0.0
+
+    def extend(self, page, next_cursor):
+        self.tasks.extend(page)
+        self._ids.extend(task["id"] for task in page)
+        self.next_cursor = next_cursor
+        self.complete = next_cursor is None
+
+    def _position(self, task_id):
+        i = bisect_left(self._ids, task_id)
+        return i, i < len(self._ids) and self._ids[i] == task_id
+
+    def upsert(self, task):
+        """Apply a created or updated task"""
+        i, present = self._position(task["id"])
+        if self.status is not None and task["status"] != self.status:
+            if present:
+                del self.tasks[i], self._ids[i]
+        elif present:
+            self.tasks[i] = task
+        elif self.complete or i < len(self._ids):
+            # Past the loaded range the task simply arrives with a later page
+            self.tasks.insert(i, task)
+            self._ids.insert(i, task["id"])
+
+    def remove(self, task_id):
+        i, present = self._position(task_id)
+        if present:
+            del self.tasks[i], self._ids[i]
+
+class ApiClient:
+    def __init__(self, base_url: str, timeout=TIMEOUT, retries: int = 3, pool_size: int = 4, max_age: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_age = max_age
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "PUT", "DELETE", "HEAD", "OPTIONS"}), raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.token = None
+        self._lists = {}
+        self._stats = None
+
+    def _request(self, method, path, expected=(200,), **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        response = self.session.request(method, self.base_url + path, **kwargs)
+        if response.status_code not in expected:
+            raise ApiError(response.status_code, _detail(response))
+        return response
+
+    # Authentication
+    def login(self, username: str, password: str):
+        response = self._request("POST", "/token", data={"username": username, "password": password})
+        self.token = response.json()["access_token"]
+        self.session.headers["Authorization"] = f"Bearer {self.token}"
+
+    def signup(self, username: str, password: str):
+        return self._request("POST", "/users/", json={"username": username, "password": password}).json()
+
+    def logout(self):
+        self.token = None
+        self.session.headers.pop("Authorization", None)
+        self.invalidate()
+        self._lists.clear()
+
+    # Reads
+    def invalidate(self):
+        """Revalidate every cached list and the stats on their next use"""
+        for task_list in self._lists.values():
+            task_list.fetched_at = 0.0
+        self._stats = None
+
+    def _fetch_page(self, task_list, cursor=None, etag=None):
+        params = {"limit": PAGE_SIZE}
+        if task_list.status:
+            params["status"] = task_list.status
+        if cursor:
+            params["cursor"] = cursor
+        headers = {"If-None-Match": etag} if etag else None
+        return self._request("GET", "/tasks/", expected=(200, 304), params=params, headers=headers)
+
+    def _load_first_page(self, task_list):
+        response = self._fetch_page(task_list, etag=task_list.etag)
+        task_list.fetched_at = time.monotonic()
+        if response.status_code == 304:
+            return task_list
+        fresh = TaskList(task_list.status)
+        fresh.etag = response.headers.get("ETag")
+        fresh.fetched_at = task_list.fetched_at
+        fresh.extend(response.json(), response.headers.get("X-Next-Cursor"))
+        self._lists[task_list.status] = fresh
+        return fresh
+
+    def tasks(self, status=None, count: int = PAGE_SIZE):
+        """The cached TaskList for `status`, with at least `count` tasks loaded when there are that many"""
+        task_list = self._lists.get(status) or TaskList(status)
+        if task_list.etag is None or time.monotonic() - task_list.fetched_at > self.max_age:
+            task_list = self._load_first_page(task_list)
+        while len(task_list.tasks) < count and not task_list.complete:
+            response = self._fetch_page(task_list, cursor=task_list.next_cursor)
+            task_list.extend(response.json(), response.headers.get("X-Next-Cursor"))
+        return task_list
+
+    def stats(self):
+        if self._stats is None or time.monotonic() - self._stats[0] > self.max_age:
+            self._stats = (time.monotonic(), self._request("GET", "/tasks/stats").json())
+        return self._stats[1]
+
+    def search(self, q: str, limit: int = 200):
+        return self._request("GET", "/tasks/search", params={"q": q, "limit": limit}).json()
+
+    # Writes: patch the cached lists from the response
+    def create_task(self, title: str, description: str):
+        task = self._request("POST", "/tasks/", json={"title": title, "description": description}).json()
+        self._apply(task)
+        return task
+
+    def update_task(self, task_id: int, title: str, description: str, status: str):
+        data = {"title": title, "description": description, "status": status}
+        task = self._request("PUT", f"/tasks/{task_id}", json=data).json()
+        self._apply(task)
+        return task
+
+    def delete_task(self, task_id: int):
+        self._request("DELETE", f"/tasks/{task_id}", expected=(204,))
+        for task_list in self._lists.values():
+            task_list.remove(task_id)
+        self._stats = None
+
+    def _apply(self, task):
+        for task_list in self._lists.values():
+            task_list.upsert(task)
+        self._stats = None
@@ -1,8 +1,10 @@
+import math
+
 import streamlit as st
-import requests
-import json
 from enum import Enum
 
+from api_client import ApiClient, ApiError
+
 # API URL - Replace with your backend URL when deployed
 API_URL = "http://127.0.0.1:8000"
 
@@ -12,6 +14,9 @@ class StatusEnum(str, Enum):
     in_progress = "in_progress"
     done = "done"
 
+# Task expanders rendered per page
+PAGE_SIZES = [10, 25, 50, 100]
+
 # Page configuration
 st.set_page_config(page_title="Task Manager", layout="wide")
 
@@ -20,21 +25,20 @@ if "token" not in st.session_state:
     st.session_state.token = None
 if "username" not in st.session_state:
     st.session_state.username = None
-if "tasks" not in st.session_state:
-    st.session_state.tasks = []
+if "api" not in st.session_state:
+    # One pooled client per browser session; it also holds the cached task lists
+    st.session_state.api = ApiClient(API_URL)
+
+api = st.session_state.api
 
 # Authentication functions
 def login(username, password):
     try:
-        response = requests.post(
-            f"{API_URL}/token",
-            data={"username": username, "password": password},
-        )
-        if response.status_code == 200:
-            data = response.json()
-            st.session_state.token = data["access_token"]
-            st.session_state.username = username
-            return True
+        api.login(username, password)
+        st.session_state.token = api.token
+        st.session_state.username = username
+        return True
+    except ApiError:
         return False
     except Exception as e:
         st.error(f"Error during login: {e}")
@@ -42,40 +46,51 @@ def login(username, password):
 
 def signup(username, password):
     try:
-        response = requests.post(
-            f"{API_URL}/users/",
-            json={"username": username, "password": password},
-        )
-        if response.status_code == 200:
-            st.success("Account created successfully! Please log in.")
-            return True
-        else:
-            st.error(f"Error: {response.json().get('detail', 'Unknown error')}")
-            return False
+        api.signup(username, password)
+        st.success("Account created successfully! Please log in.")
+        return True
+    except ApiError as e:
+        st.error(f"Error: {e.detail}")
+        return False
     except Exception as e:
         st.error(f"Error during signup: {e}")
         return False
 
 def logout():
+    api.logout()
     st.session_state.token = None
     st.session_state.username = None
-    st.session_state.tasks = []
 
 # Task functions
-def fetch_tasks():
+def fetch_tasks(status, count):
+    """The cached task list for `status` (filtered server-side), loaded up to `count` tasks"""
     if not st.session_state.token:
-        return []
+        return None
     
     try:
-        headers = {"Authorization": f"Bearer {st.session_state.token}"}
-        response = requests.get(f"{API_URL}/tasks/", headers=headers)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error("Failed to fetch tasks")
-            return []
+        return api.tasks(status, count)
     except Exception as e:
         st.error(f"Error fetching tasks: {e}")
+        return None
+
+def fetch_task_stats():
+    if not st.session_state.token:
+        return None
+    
+    try:
+        return api.stats()
+    except Exception as e:
+        st.error(f"Error fetching task stats: {e}")
+        return None
+
+def search_tasks(query):
+    if not st.session_state.token:
+        return []
+    
+    try:
+        return api.search(query)
+    except Exception as e:
+        st.error(f"Error searching tasks: {e}")
         return []
 
 def create_task(title, description):
@@ -83,15 +98,12 @@ def create_task(title, description):
         return False
     
     try:
-        headers = {"Authorization": f"Bearer {st.session_state.token}"}
-        data = {"title": title, "description": description}
-        response = requests.post(f"{API_URL}/tasks/", json=data, headers=headers)
-        if response.status_code == 200:
-            st.success("Task created successfully!")
-            return True
-        else:
-            st.error(f"Error creating task: {response.json().get('detail', 'Unknown error')}")
-            return False
+        api.create_task(title, description)
+        st.success("Task created successfully!")
+        return True
+    except ApiError as e:
+        st.error(f"Error creating task: {e.detail}")
+        return False
     except Exception as e:
         st.error(f"Error creating task: {e}")
         return False
@@ -101,15 +113,12 @@ def update_task_status(task_id, title, description, status):
         return False
     
     try:
-        headers = {"Authorization": f"Bearer {st.session_state.token}"}
-        data = {"title": title, "description": description, "status": status}
-        response = requests.put(f"{API_URL}/tasks/{task_id}", json=data, headers=headers)
-        if response.status_code == 200:
-            st.success("Task updated successfully!")
-            return True
-        else:
-            st.error(f"Error updating task: {response.json().get('detail', 'Unknown error')}")
-            return False
+        api.update_task(task_id, title, description, status)
+        st.success("Task updated successfully!")
+        return True
+    except ApiError as e:
+        st.error(f"Error updating task: {e.detail}")
+        return False
     except Exception as e:
         st.error(f"Error updating task: {e}")
         return False
@@ -119,14 +128,12 @@ def delete_task(task_id):
         return False
     
     try:
-        headers = {"Authorization": f"Bearer {st.session_state.token}"}
-        response = requests.delete(f"{API_URL}/tasks/{task_id}", headers=headers)
-        if response.status_code == 204:
-            st.success("Task deleted successfully!")
-            return True
-        else:
-            st.error(f"Error deleting task: {response.status_code}")
-            return False
+        api.delete_task(task_id)
+        st.success("Task deleted successfully!")
+        return True
+    except ApiError as e:
+        st.error(f"Error deleting task: {e.status_code}")
+        return False
     except Exception as e:
         st.error(f"Error deleting task: {e}")
         return False
@@ -172,8 +179,14 @@ def show_task_dashboard():
     with col2:
         st.button("Logout", on_click=logout)
     
-    # Fetch and display tasks
-    st.session_state.tasks = fetch_tasks()
+    # Per-status counts come from a single aggregate query
+    stats = fetch_task_stats()
+    if stats:
+        stat_cols = st.columns(4)
+        stat_cols[0].metric("Total", stats["total"])
+        stat_cols[1].metric("Pending", stats["pending"])
+        stat_cols[2].metric("In progress", stats["in_progress"])
+        stat_cols[3].metric("Done", stats["done"])
     
     # Create new task
     with st.expander("Create New Task", expanded=False):
@@ -185,24 +198,44 @@ def show_task_dashboard():
             if submit:
                 if title:
                     if create_task(title, description):
-                        st.session_state.tasks = fetch_tasks()
                         st.rerun()
                 else:
                     st.error("Title is required")
     
     # Filter tasks
-    status_filter = st.selectbox(
+    search_query = st.text_input("Search tasks", placeholder="Words in the title or description (add * for a prefix)")
+    filter_col, size_col, refresh_col = st.columns([3, 1, 1])
+    status_filter = filter_col.selectbox(
         "Filter by status", 
         ["All", StatusEnum.pending.value, StatusEnum.in_progress.value, StatusEnum.done.value]
     )
+    page_size = size_col.selectbox("Per page", PAGE_SIZES, index=1)
+    if refresh_col.button("Refresh"):
+        api.invalidate()
+        st.rerun()
+    
+    # Only the current page is rendered; the task list is cached and loaded as far as the page needs
+    if search_query.strip():
+        # Search results are ranked by relevance
+        tasks = [
+            task for task in search_tasks(search_query)
+            if status_filter == "All" or task["status"] == status_filter
+        ]
+        total = len(tasks)
+    else:
+        status = None if status_filter == "All" else status_filter
+        total = (stats or {}).get("total" if status is None else status, 0)
+        tasks = None
+    pages = max(1, math.ceil(total / page_size))
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    offset = (page - 1) * page_size
+    if tasks is None:
+        task_list = fetch_tasks(status, offset + page_size)
+        tasks = task_list.tasks if task_list else []
+    page_tasks = tasks[offset:offset + page_size]
     
-    # Display tasks
-    if st.session_state.tasks:
-        filtered_tasks = st.session_state.tasks
-        if status_filter != "All":
-            filtered_tasks = [task for task in st.session_state.tasks if task["status"] == status_filter]
-        
-        for task in filtered_tasks:
+    if page_tasks:
+        for task in page_tasks:
             with st.expander(f"{task['title']} ({task['status']})"):
                 task_title = st.text_input("Title", value=task["title"], key=f"title_{task['id']}")
                 task_description = st.text_area("Description", value=task["description"], key=f"desc_{task['id']}")
@@ -217,13 +250,11 @@ def show_task_dashboard():
                 with col1:
                     if st.button("Update", key=f"update_{task['id']}"):
                         if update_task_status(task["id"], task_title, task_description, task_status):
-                            st.session_state.tasks = fetch_tasks()
                             st.rerun()
                 
                 with col2:
                     if st.button("Delete", key=f"delete_{task['id']}"):
                         if delete_task(task["id"]):
-                            st.session_state.tasks = fetch_tasks()
                             st.rerun()
     else:
         st.info("No tasks found. Create a new task to get started!")
@@ -1,4 +1,107 @@
-import uvicorn
+"""Run the FastAPI server.
+
+    python run_api.py                          # development: one process, auto-reload
+    python run_api.py --production --workers 8 # production: N workers, preloaded app
+
+Production mode applies schema migrations once, in the parent process, and
+starts the workers with ``TASKS_AUTO_MIGRATE=0``. With gunicorn installed
+(Linux/macOS) the app is imported once before forking (``preload_app``), workers
+are drained gracefully on SIGTERM, restarted one by one on SIGHUP and
+recycled after ``--max-requests``. Without gunicorn it falls back to uvicorn's
+own multi-process supervisor, which spawns workers that each import the app.
+"""
+import argparse
+import os
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return default if value is None or value == "" else int(value)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Task Manager API")
+    parser.add_argument("--production", action="store_true", help="multi-worker mode without auto-reload")
+    parser.add_argument("--host", default=os.getenv("TASKS_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=_env_int("TASKS_PORT", 8000))
+    parser.add_argument("--workers", type=int, default=_env_int("TASKS_WORKERS", os.cpu_count() or 1))
+    parser.add_argument("--keep-alive", type=int, default=_env_int("TASKS_KEEP_ALIVE", 5),
+                        help="seconds an idle keep-alive connection is held open")
+    parser.add_argument("--backlog", type=int, default=_env_int("TASKS_BACKLOG", 2048),
+                        help="pending connections the listen socket queues")
+    parser.add_argument("--graceful-timeout", type=int, default=_env_int("TASKS_GRACEFUL_TIMEOUT", 30),
+                        help="seconds a stopping worker may spend finishing in-flight requests")
+    parser.add_argument("--max-requests", type=int, default=_env_int("TASKS_MAX_REQUESTS", 0),
+                        help="recycle a worker after this many requests (0 = never; gunicorn only)")
+    return parser.parse_args(argv)
+
+def migrate_once():
+    """Bring the schema up to date before any worker starts"""
+    from backend import config, database, migrations
+    from backend.database import SQLALCHEMY_DATABASE_URL, create_db_engine
+
+    if config.SHARDS > 1:
+        try:
+            print(f"schema at version {migrations.upgrade_all()}")
+        finally:
+            # Drop the pooled connections so forked workers don't inherit them
+            for shard_engine in database.shard_engines:
+                shard_engine.dispose()
+        return
+    # A throwaway engine, so no pooled connection is inherited by forked workers
+    engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+    try:
+        print(f"schema at version {migrations.upgrade(engine)}")
+    finally:
+        engine.dispose()
+
+def run_gunicorn(args, BaseApplication):
+    class Application(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{args.host}:{args.port}",
+                "workers": args.workers,
+                "worker_class": "uvicorn.workers.UvicornWorker",
+                "preload_app": True,
+                "keepalive": args.keep_alive,
+                "backlog": args.backlog,
+                "graceful_timeout": args.graceful_timeout,
+                "timeout": max(args.graceful_timeout * 2, 60),
+                "max_requests": args.max_requests,
+                "max_requests_jitter": args.max_requests // 10,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from backend.main import app
+            return app
+
+    Application().run()
+
+def run_uvicorn_workers(args):
+    import uvicorn
+
+    uvicorn.run(
+        "backend.main:app", host=args.host, port=args.port, workers=args.workers,
+        timeout_keep_alive=args.keep_alive, backlog=args.backlog,
+    )
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.production:
+        import uvicorn
+
+        uvicorn.run("backend.main:app", host=args.host, port=args.port, reload=True)
+        return
+
+    # Must be set before backend.config is imported, here and in every worker
+    os.environ["TASKS_AUTO_MIGRATE"] = "0"
+    migrate_once()
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:  # not installed, or not supported on this platform (Windows)
+        run_uvicorn_workers(args)
+    else:
+        run_gunicorn(args, BaseApplication)
 
 if __name__ == "__main__":
-    uvicorn.run("backend.main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    main()
@@ -0,0 +1,53 @@
+"""Shared fixtures: the test session runs against a throwaway SQLite database"""
+import itertools
+import os
+import shutil
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="tasks-tests-")
+# The backend reads its settings at import time
+os.environ.update(
+    TASKS_DATABASE_URL=f"sqlite:///{os.path.join(_tmp, 'tasks.db')}",
+    TASKS_RATE_LIMIT="0",
+    TASKS_BCRYPT_ROUNDS="4",
+)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import crud, database, schemas
+from backend.main import app
+
+_usernames = itertools.count()
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def db(client):
+    with database.SessionLocal() as db:
+        yield db
+
+@pytest.fixture
+def user(db):
+    username = f"user{next(_usernames)}"
+    return crud.create_user(db, schemas.UserCreate(username=username, password="x"), hashed_password="x")
+
+@pytest.fixture
+def signup(client):
+    """Factory of authorization headers for fresh users, signed up and logged in through the API"""
+    def signup():
+        username = f"user{next(_usernames)}"
+        assert client.post("/users/", json={"username": username, "password": "pw"}).status_code == 200
+        token = client.post("/token", data={"username": username, "password": "pw"}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+    return signup
+
+@pytest.fixture
+def headers(signup):
+    return signup()
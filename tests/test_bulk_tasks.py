@@ -0,0 +1,44 @@
+import pytest
+
+@pytest.fixture
+def task_id(client, headers):
+    return client.post("/tasks/", json={"title": "patch me", "description": "text"}, headers=headers).json()["id"]
+
+@pytest.mark.parametrize("field", ["title", "status"])
+def test_bulk_patch_rejects_null_for_non_nullable_fields(client, headers, task_id, field):
+    response = client.patch("/tasks/bulk", json=[{"id": task_id, field: None}], headers=headers)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"][-1] == field
+    # Nothing was written, so the listings still validate
+    assert client.get(f"/tasks/{task_id}", headers=headers).json()["title"] == "patch me"
+    assert client.get("/tasks/", headers=headers).status_code == 200
+
+def test_bulk_patch_omitted_fields_are_kept(client, headers, task_id):
+    response = client.patch("/tasks/bulk", json=[{"id": task_id, "status": "done"}], headers=headers)
+    assert response.json() == [{"id": task_id, "status_code": 200, "detail": None}]
+    task = client.get(f"/tasks/{task_id}", headers=headers).json()
+    assert (task["title"], task["description"], task["status"]) == ("patch me", "text", "done")
+
+def test_bulk_patch_can_clear_the_description(client, headers, task_id):
+    assert client.patch("/tasks/bulk", json=[{"id": task_id, "description": None}], headers=headers).status_code == 200
+    assert client.get(f"/tasks/{task_id}", headers=headers).json()["description"] is None
+
+def test_bulk_create_results_follow_item_order(client, headers):
+    titles = [f"item {i}" for i in range(20)]
+    results = client.post("/tasks/bulk", json=[{"title": title} for title in titles], headers=headers).json()
+    assert [client.get(f"/tasks/{result['id']}", headers=headers).json()["title"] for result in results] == titles
+
+def test_bulk_results_follow_submission_order_not_id_order(client, headers, signup):
+    ids = [item["id"] for item in client.post("/tasks/bulk", json=[{"title": f"t{i}"} for i in range(4)], headers=headers).json()]
+    theirs = client.post("/tasks/", json={"title": "not mine"}, headers=signup()).json()["id"]
+    order = [ids[3], theirs, ids[0], 10**9, ids[2]]
+
+    patched = client.patch("/tasks/bulk", json=[{"id": task_id, "title": f"renamed {task_id}"} for task_id in order], headers=headers).json()
+    assert [(item["id"], item["status_code"]) for item in patched] == [(ids[3], 200), (theirs, 403), (ids[0], 200), (10**9, 404), (ids[2], 200)]
+    assert {task["id"]: task["title"] for task in client.get("/tasks/", headers=headers).json()} == {
+        ids[0]: f"renamed {ids[0]}", ids[1]: "t1", ids[2]: f"renamed {ids[2]}", ids[3]: f"renamed {ids[3]}",
+    }
+
+    deleted = client.request("DELETE", "/tasks/bulk", json={"ids": order}, headers=headers).json()
+    assert [(item["id"], item["status_code"]) for item in deleted] == [(ids[3], 204), (theirs, 403), (ids[0], 204), (10**9, 404), (ids[2], 204)]
+    assert [task["id"] for task in client.get("/tasks/", headers=headers).json()] == [ids[1]]
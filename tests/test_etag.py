@@ -0,0 +1,46 @@
+import pytest
+
+from backend import main
+from backend.cache import TTLCache
+
+def test_repeated_get_is_not_modified(client, headers):
+    task_id = client.post("/tasks/", json={"title": "cached"}, headers=headers).json()["id"]
+    for path in ("/tasks/", f"/tasks/{task_id}"):
+        first = client.get(path, headers=headers)
+        etag = first.headers["etag"]
+        again = client.get(path, headers=dict(headers, **{"If-None-Match": etag}))
+        assert again.status_code == 304
+        assert again.headers["etag"] == etag
+        assert again.content == b""
+
+def test_write_changes_the_etag(client, headers):
+    task_id = client.post("/tasks/", json={"title": "before"}, headers=headers).json()["id"]
+    etag = client.get("/tasks/", headers=headers).headers["etag"]
+    client.put(f"/tasks/{task_id}", json={"title": "after", "status": "done"}, headers=headers)
+
+    response = client.get("/tasks/", headers=dict(headers, **{"If-None-Match": etag}))
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [task["title"] for task in response.json()] == ["after"]
+
+def test_etag_is_per_query(client, headers):
+    client.post("/tasks/", json={"title": "one"}, headers=headers)
+    assert client.get("/tasks/", headers=headers).headers["etag"] != client.get("/tasks/?limit=5", headers=headers).headers["etag"]
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    cache = TTLCache(maxsize=100, ttl=60)
+    monkeypatch.setattr(main, "response_cache", cache)
+    return cache
+
+def test_response_cache_serves_bodies_until_a_write(client, headers, response_cache):
+    task_id = client.post("/tasks/", json={"title": "v1"}, headers=headers).json()["id"]
+    first = client.get("/tasks/", headers=headers)
+    second = client.get("/tasks/", headers=headers)
+    assert response_cache.hits == 1
+    assert second.content == first.content and second.headers["etag"] == first.headers["etag"]
+
+    client.put(f"/tasks/{task_id}", json={"title": "v2", "status": "pending"}, headers=headers)
+    third = client.get("/tasks/", headers=headers)
+    assert third.headers["etag"] != first.headers["etag"]
+    assert [task["title"] for task in third.json()] == ["v2"]
@@ -0,0 +1,62 @@
+import asyncio
+import multiprocessing
+
+from backend import events
+
+def _publish(broker, count=1, owner_id=1):
+    broker._dispatch([(owner_id, "task.updated", {"id": seq}) for seq in range(count)])
+    return f"{broker.epoch}-{broker.last_seq}"
+
+def _in_child(parent_id, results):
+    # A fresh broker, and the module broker this process inherited by forking
+    child = events.EventBroker()
+    results.put((_publish(child, 2), child._replay(1, parent_id), events.broker.epoch))
+
+def test_brokers_in_separate_processes_reject_each_others_ids():
+    parent = events.EventBroker()
+    parent_id = _publish(parent, 2)
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    child = context.Process(target=_in_child, args=(parent_id, results))
+    child.start()
+    child_id, child_replay, child_module_epoch = results.get(timeout=30)
+    child.join()
+
+    assert parent._replay(1, parent_id) == []
+    assert parent._replay(1, child_id) is None
+    assert child_replay is None
+    # A forked worker does not continue the feed of the process it was forked from
+    assert child_module_epoch != events.broker.epoch
+
+def test_replay_resumes_after_the_last_seen_event():
+    broker = events.EventBroker(buffer_size=8)
+    _publish(broker, 2, owner_id=1)
+    last_seen = f"{broker.epoch}-{broker.last_seq}"
+    _publish(broker, 1, owner_id=2)
+    _publish(broker, 2, owner_id=1)
+    assert [event.seq for event in broker._replay(1, last_seen)] == [4, 5]
+    # Admins (owner None) see every owner's events
+    assert [event.seq for event in broker._replay(None, last_seen)] == [3, 4, 5]
+    assert broker._replay(1, None) == []
+
+def test_replay_needs_a_reset_for_unknown_ids():
+    broker = events.EventBroker(buffer_size=4)
+    _publish(broker, 10)
+    assert broker._replay(1, f"{broker.epoch}-2") is None  # no longer buffered
+    assert broker._replay(1, f"{broker.epoch}-11") is None  # not issued yet
+    assert broker._replay(1, f"{events.EventBroker().epoch}-9") is None  # another broker's
+    assert broker._replay(1, "garbage") is None
+    assert broker._replay(1, f"{broker.epoch}-6") == list(broker._buffer)
+
+def test_subscribing_with_a_foreign_id_starts_with_a_reset():
+    async def first_frame():
+        broker = events.EventBroker()
+        subscription = broker.subscribe(1, last_event_id="deadbeef-3")
+        frames = subscription.frames(heartbeat=1)
+        try:
+            return await frames.__anext__()
+        finally:
+            await frames.aclose()
+            subscription.close()
+
+    assert b"event: reset" in asyncio.run(first_frame())
@@ -0,0 +1,23 @@
+import csv
+import io
+import json
+
+def test_ndjson_export(client, headers):
+    client.post("/tasks/bulk", json=[{"title": f"export {i}", "description": "d"} for i in range(5)], headers=headers)
+    response = client.get("/tasks/export", params={"format": "ndjson"}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["title"] for row in rows] == [f"export {i}" for i in range(5)]
+    assert set(rows[0]) == {"id", "title", "description", "status", "owner_id"}
+
+def test_csv_export(client, headers):
+    client.post("/tasks/bulk", json=[{"title": f"export, {i}"} for i in range(3)], headers=headers)
+    client.delete(f"/tasks/{client.get('/tasks/', headers=headers).json()[0]['id']}", headers=headers)
+    response = client.get("/tasks/export", params={"format": "csv"}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="tasks.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    # Deleted tasks are not exported; commas survive quoting
+    assert [row["title"] for row in rows] == ["export, 1", "export, 2"]
@@ -0,0 +1,39 @@
+import pytest
+
+# title -> status
+DATASET = {
+    "alpha report": "pending",
+    "alpha review": "done",
+    "beta report": "in_progress",
+    "gamma notes": "done",
+    "delta notes": "done",
+}
+
+@pytest.fixture
+def dataset(client, headers):
+    created = client.post("/tasks/bulk", json=[{"title": title} for title in DATASET], headers=headers).json()
+    ids = dict(zip(DATASET, (item["id"] for item in created)))
+    client.patch("/tasks/bulk", json=[{"id": ids[title], "status": status} for title, status in DATASET.items()], headers=headers)
+    return ids
+
+def _titles(client, headers, **params):
+    response = client.get("/tasks/", params=params, headers=headers)
+    assert response.status_code == 200
+    return [task["title"] for task in response.json()]
+
+def test_status_filter(client, headers, dataset):
+    assert _titles(client, headers, status="done") == ["alpha review", "gamma notes", "delta notes"]
+    assert _titles(client, headers, status=["pending", "in_progress"]) == ["alpha report", "beta report"]
+
+def test_title_filters(client, headers, dataset):
+    assert _titles(client, headers, title_prefix="alpha") == ["alpha report", "alpha review"]
+    assert _titles(client, headers, q="report") == ["alpha report", "beta report"]
+    assert _titles(client, headers, q="notes", status="done") == ["gamma notes", "delta notes"]
+
+def test_sort_by_title(client, headers, dataset):
+    assert _titles(client, headers, sort="title") == sorted(DATASET)
+    assert _titles(client, headers, sort="-title", limit=2) == sorted(DATASET, reverse=True)[:2]
+
+def test_stats_count_each_status(client, headers, dataset):
+    stats = client.get("/tasks/stats", headers=headers).json()
+    assert stats == {"pending": 1, "in_progress": 1, "done": 3, "total": 5}
@@ -0,0 +1,38 @@
+import asyncio
+import os
+import signal
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi import HTTPException
+
+from backend import config, hashing
+
+@pytest.fixture
+def pool():
+    hashing.configure(workers=1)
+    yield
+    hashing.configure(workers=config.PASSWORD_HASH_WORKERS)
+
+def test_pool_recovers_after_a_worker_dies(pool):
+    hashed = asyncio.run(hashing.hash_password("secret"))
+    for process in list(hashing._pool._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+        process.join()
+
+    assert asyncio.run(hashing.verify_password("secret", hashed))[0]
+    assert hashing.stats()["pending"] == 0
+
+class BrokenPool:
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("worker died")
+
+    def shutdown(self, **kwargs):
+        pass
+
+def test_pool_that_stays_broken_answers_503(pool, monkeypatch):
+    monkeypatch.setattr(hashing, "_get_pool", BrokenPool)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(hashing.hash_password("secret"))
+    assert error.value.status_code == 503
+    assert hashing.stats()["pending"] == 0
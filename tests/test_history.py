@@ -0,0 +1,40 @@
+import time
+from datetime import datetime
+
+def _now():
+    time.sleep(0.01)
+    moment = datetime.utcnow().isoformat()
+    time.sleep(0.01)
+    return moment
+
+def test_as_of_reads_the_past(client, headers):
+    task_id = client.post("/tasks/", json={"title": "original"}, headers=headers).json()["id"]
+    as_of = _now()
+    client.put(f"/tasks/{task_id}", json={"title": "renamed", "status": "done"}, headers=headers)
+    later_id = client.post("/tasks/", json={"title": "later"}, headers=headers).json()["id"]
+
+    listing = client.get("/tasks/", params={"as_of": as_of}, headers=headers).json()
+    assert [(task["id"], task["title"], task["status"]) for task in listing] == [(task_id, "original", "pending")]
+    assert client.get(f"/tasks/{task_id}", params={"as_of": as_of}, headers=headers).json()["title"] == "original"
+    assert client.get(f"/tasks/{later_id}", params={"as_of": as_of}, headers=headers).status_code == 404
+    assert [task["title"] for task in client.get("/tasks/", headers=headers).json()] == ["renamed", "later"]
+
+def test_as_of_still_shows_tasks_deleted_since(client, headers):
+    task_id = client.post("/tasks/", json={"title": "doomed"}, headers=headers).json()["id"]
+    as_of = _now()
+    client.delete(f"/tasks/{task_id}", headers=headers)
+    assert client.get("/tasks/", headers=headers).json() == []
+    assert [task["id"] for task in client.get("/tasks/", params={"as_of": as_of}, headers=headers).json()] == [task_id]
+
+def test_history_logs_changed_fields_and_the_delete(client, headers, signup):
+    task_id = client.post("/tasks/", json={"title": "logged"}, headers=headers).json()["id"]
+    client.put(f"/tasks/{task_id}", json={"title": "logged", "status": "done"}, headers=headers)
+    client.delete(f"/tasks/{task_id}", headers=headers)
+
+    history = client.get(f"/tasks/{task_id}/history", headers=headers).json()
+    assert [(revision["op"], revision["changes"]) for revision in history] == [
+        ("created", {"title": "logged", "description": None, "status": "pending"}),
+        ("updated", {"status": "done"}),
+        ("deleted", {}),
+    ]
+    assert client.get(f"/tasks/{task_id}/history", headers=signup()).status_code == 403
@@ -0,0 +1,37 @@
+import base64
+
+import pytest
+
+def _walk(client, headers, params):
+    seen, cursor = [], None
+    while True:
+        response = client.get("/tasks/", params=dict(params, **({"cursor": cursor} if cursor else {})), headers=headers)
+        assert response.status_code == 200
+        seen += [task["id"] for task in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return seen
+
+@pytest.mark.parametrize("sort", ["id", "-id"])
+def test_cursor_walk_sees_every_task_once(client, headers, sort):
+    ids = [task["id"] for task in client.post("/tasks/bulk", json=[{"title": f"page {i}"} for i in range(7)], headers=headers).json()]
+    seen = _walk(client, headers, {"limit": 3, "sort": sort})
+    assert seen == sorted(ids, reverse=sort == "-id")
+
+def test_next_page_link_matches_the_cursor(client, headers):
+    client.post("/tasks/bulk", json=[{"title": "a"}, {"title": "b"}], headers=headers)
+    response = client.get("/tasks/", params={"limit": 1}, headers=headers)
+    assert f"cursor={response.headers['x-next-cursor']}" in response.links["next"]["url"]
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    base64.urlsafe_b64encode(b"id:abc").decode(),
+    base64.urlsafe_b64encode(b"offset:5").decode(),
+])
+def test_malformed_cursor_is_rejected(client, headers, cursor):
+    response = client.get("/tasks/", params={"cursor": cursor}, headers=headers)
+    assert response.status_code == 400
+
+def test_cursor_requires_id_sort(client, headers):
+    cursor = base64.urlsafe_b64encode(b"id:1").decode()
+    assert client.get("/tasks/", params={"cursor": cursor, "sort": "title"}, headers=headers).status_code == 400
@@ -0,0 +1,94 @@
+"""Per-endpoint SQL round-trip budgets, so an accidental extra query (an N+1) on a hot path fails the suite"""
+import pytest
+from sqlalchemy import event
+
+from backend import crud, database
+
+# (method, path template, budget); paths are formatted with the ids created for each case.
+# Task reads include the task list version lookup behind their ETag, and every
+# successful task write includes the version bump. "COND" requests repeat the
+# read with the ETag it returned and must be answered with a 304. Task writes
+# also append their task_revisions row; an update first reads the current row
+# (under the write lock) so that only the changed fields are written and logged.
+# Creates, deletes and status changes also adjust the analytics counters
+# (status counts, plus daily created counts for creates). The budgets are for
+# one database: with TASKS_SHARDS > 1 every request also looks its owner up in
+# the shard map, and by-id admin requests probe the shards for the task.
+BUDGETS = [
+    ("GET", "/tasks/", 2),
+    ("GET", "/tasks/?status=done&sort=-id", 2),
+    ("COND GET", "/tasks/", 1),
+    ("GET", "/tasks/stats", 1),
+    # The FTS index lookup is checked once per pooled connection
+    ("GET", "/tasks/search?q=budget", 2),
+    ("GET", "/tasks/{own}", 2),
+    ("COND GET", "/tasks/{own}", 1),
+    ("POST", "/tasks/", 5),
+    ("PUT", "/tasks/{own}", 5),
+    ("PUT", "/tasks/{other}", 2),
+    ("PUT", "/tasks/{missing}", 2),
+    ("DELETE", "/tasks/{own}", 4),
+    ("DELETE", "/tasks/{other}", 2),
+    ("ADMIN PUT", "/tasks/{other}", 5),
+    ("ADMIN DELETE", "/tasks/{other}", 4),
+    # Counter tables only: status counts per owner and the daily series
+    ("ADMIN GET", "/admin/analytics", 2),
+]
+
+class QueryCounter:
+    def __init__(self, engines):
+        self.count = 0
+        self.engines = engines
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def close(self):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._on_execute)
+
+@pytest.fixture(scope="module")
+def accounts(client):
+    headers = {}
+    for role in ("owner", "other", "root"):
+        username = f"budget-{role}"
+        client.post("/users/", json={"username": username, "password": "secret"})
+        token = client.post("/token", data={"username": username, "password": "secret"}).json()["access_token"]
+        headers[role] = {"Authorization": f"Bearer {token}"}
+    with database.SessionLocal() as db:
+        crud.update_user_role(db, crud.get_user_by_username(db, "budget-root").id, "admin")
+    return headers
+
+@pytest.fixture
+def queries():
+    engines = list(database.shard_engines)
+    if database.async_engine is not None:
+        engines.append(database.async_engine.sync_engine)
+    counter = QueryCounter(engines)
+    yield counter
+    counter.close()
+
+@pytest.mark.parametrize("method, template, budget", BUDGETS, ids=[f"{m} {t}" for m, t, _ in BUDGETS])
+def test_endpoint_stays_within_its_query_budget(client, accounts, queries, method, template, budget):
+    def new_task(role):
+        return client.post("/tasks/", json={"title": "budget"}, headers=accounts[role]).json()["id"]
+
+    role = "root" if method.startswith("ADMIN") else "owner"
+    http_method = method.split()[-1]
+    path = template.format(own=new_task("owner"), other=new_task("other"), missing=10**9)
+    body = {"title": "budget", "status": "done"} if http_method in ("POST", "PUT") else None
+    headers = dict(accounts[role])
+    # Warm the token cache, and fetch the ETag for conditional requests
+    warm = client.get("/users/me/" if not method.startswith("COND") else path, headers=headers)
+    if method.startswith("COND"):
+        headers["If-None-Match"] = warm.headers["etag"]
+
+    queries.count = 0
+    response = client.request(http_method, path, json=body, headers=headers)
+    # Denied and missing tasks are part of the budget; auth or rate-limit failures are not
+    assert response.status_code in (200, 204, 304, 403, 404), response.text
+    assert queries.count <= budget, f"{method} {template}: {queries.count} queries, budget {budget}"
+    if method.startswith("COND"):
+        assert response.status_code == 304
@@ -0,0 +1,25 @@
+import pytest
+
+from backend import config, ratelimit
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(ratelimit, "limiter", ratelimit.RateLimiter(ratelimit.MemoryBackend()))
+
+def _signup(client, username):
+    assert client.post("/users/", json={"username": username, "password": "pw"}).status_code == 200
+
+def test_failed_logins_only_lock_out_their_username(client, limiter):
+    # Every request comes from the same address, like the Streamlit frontend's
+    _signup(client, "victim")
+    _signup(client, "bystander")
+    for _ in range(config.RATE_LIMIT_LOGIN_BURST):
+        assert client.post("/token", data={"username": "victim", "password": "wrong"}).status_code == 401
+    assert client.post("/token", data={"username": "victim", "password": "pw"}).status_code == 429
+    assert client.post("/token", data={"username": "bystander", "password": "pw"}).status_code == 200
+
+def test_per_ip_bucket_caps_floods(client, limiter, monkeypatch):
+    monkeypatch.setattr(config, "RATE_LIMIT_IP_BURST", 2)
+    _signup(client, "flood1")
+    _signup(client, "flood2")
+    assert client.post("/users/", json={"username": "flood3", "password": "pw"}).status_code == 429
@@ -0,0 +1,18 @@
+def test_best_match_comes_first(client, headers):
+    client.post("/tasks/bulk", json=[
+        {"title": "groceries", "description": "buy milk and a lamp"},
+        {"title": "fix the lamp", "description": "lamp in the hall, lamp bulb"},
+        {"title": "unrelated", "description": "nothing here"},
+    ], headers=headers)
+    results = client.get("/tasks/search", params={"q": "lamp"}, headers=headers).json()
+    assert [task["title"] for task in results] == ["fix the lamp", "groceries"]
+
+def test_every_word_must_match_and_prefixes_work(client, headers):
+    client.post("/tasks/bulk", json=[{"title": "quarterly budget"}, {"title": "quarterly review"}], headers=headers)
+    assert [task["title"] for task in client.get("/tasks/search", params={"q": "quarterly budget"}, headers=headers).json()] == ["quarterly budget"]
+    assert len(client.get("/tasks/search", params={"q": "quarter*"}, headers=headers).json()) == 2
+
+def test_search_only_sees_own_tasks(client, headers, signup):
+    client.post("/tasks/", json={"title": "zeppelin mine"}, headers=headers)
+    client.post("/tasks/", json={"title": "zeppelin theirs"}, headers=signup())
+    assert [task["title"] for task in client.get("/tasks/search", params={"q": "zeppelin"}, headers=headers).json()] == ["zeppelin mine"]
@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Shards are configured at import, so the move runs in its own interpreter
+CHILD = """
+import json, threading
+from backend import crud, database, migrations, schemas, sharding
+migrations.upgrade_all()
+with database.SessionLocal() as db:
+    owner_id = crud.create_user(db, schemas.UserCreate(username="mover", password="x"), hashed_password="x").id
+    for i in range(20):
+        crud.create_task(db, schemas.TaskCreate(title=f"task {i}"), owner_id=owner_id)
+source = sharding.current_shard(owner_id)
+
+def global_version():
+    with database.SessionLocal() as db:
+        return crud.get_global_task_version(db)
+
+samples, done = [global_version()], threading.Event()
+def sample():
+    while not done.is_set():
+        samples.append(global_version())
+sampler = threading.Thread(target=sample)
+sampler.start()
+try:
+    sharding.move_user(owner_id, (source + 1) % 2, drain=0.2, batch_size=7, log=lambda message: None)
+finally:
+    done.set()
+    sampler.join()
+samples.append(global_version())
+print(json.dumps({"samples": samples, "moved": sharding.current_shard(owner_id) != source}))
+"""
+
+def test_global_task_version_never_decreases_across_a_move(tmp_path):
+    env = dict(
+        os.environ,
+        TASKS_DATABASE_URL=f"sqlite:///{tmp_path / 'main.db'}",
+        TASKS_SHARDS="2",
+        TASKS_SHARD_URL_TEMPLATE=f"sqlite:///{tmp_path / 'shard{shard}.db'}",
+        TASKS_SHARD_MAP_CACHE_TTL="0",
+    )
+    result = subprocess.run([sys.executable, "-c", CHILD], env=env, cwd=Path(__file__).parents[1], capture_output=True, text=True, check=True)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    samples = report["samples"]
+    assert report["moved"]
+    assert all(before <= after for before, after in zip(samples, samples[1:])), samples
+    assert samples[-1] > samples[0]
@@ -0,0 +1,51 @@
+import random
+import threading
+
+from sqlalchemy import text
+
+from backend import crud, database, migrations, schemas
+
+STATUSES = ["pending", "in_progress", "done"]
+
+def _race(owner_id, task_ids, threads=8, writes=150):
+    """Single and bulk updates and deletes of the same tasks from several threads"""
+    def work(seed):
+        rng = random.Random(seed)
+        for _ in range(writes):
+            with database.SessionLocal() as db:
+                op = rng.random()
+                if op < 0.05:
+                    crud.delete_task(db, rng.choice(task_ids), owner_id)
+                elif op < 0.1:
+                    crud.delete_tasks(db, rng.sample(task_ids, 3), owner_id)
+                elif op < 0.5:
+                    patches = [schemas.TaskPatch(id=task_id, status=rng.choice(STATUSES)) for task_id in rng.sample(task_ids, 3)]
+                    crud.update_tasks(db, patches, owner_id)
+                else:
+                    crud.update_task(db, rng.choice(task_ids), schemas.TaskUpdate(title="x", status=rng.choice(STATUSES)), owner_id)
+
+    workers = [threading.Thread(target=work, args=(seed,)) for seed in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+def test_status_counters_match_a_recount_after_concurrent_writes(db, user):
+    created = crud.create_tasks(db, [schemas.TaskCreate(title=f"task {i}") for i in range(100)], user.id)
+    _race(user.id, [result.id for result in created])
+
+    with database.engine.connect() as conn:
+        assert migrations.task_counter_drift(conn) == {}
+        # A deleted task is never written again
+        assert conn.execute(text(
+            "SELECT count(*) FROM task_revisions r JOIN task_revisions d"
+            " ON d.task_id = r.task_id AND d.op = 'deleted' AND r.id > d.id"
+        )).scalar() == 0
+
+def test_recount_rebuilds_drifted_counters(db, user):
+    crud.create_tasks(db, [schemas.TaskCreate(title="a"), schemas.TaskCreate(title="b")], user.id)
+    with database.engine.begin() as conn:
+        conn.execute(text("UPDATE task_status_counts SET count = count + 5 WHERE owner_id = :owner"), {"owner": user.id})
+        assert migrations.task_counter_drift(conn) == {(user.id, "pending"): (7, 2)}
+        migrations.recount_task_statuses(conn)
+        assert migrations.task_counter_drift(conn) == {}